@@ -0,0 +1,98 @@
+"""Vergelijk de kolomgebaseerde normalizer met de oude record-per-rij variant.
+
+    python benchmarks/bench_normalize.py --shops 10 --days 365
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
+
+from data_transformer import normalize_vemcount_response
+from benchmarks.synthetic import generate_payload
+
+
+def legacy_normalize_vemcount_response(response_json):
+    records = []
+
+    for date_key, shop_data in response_json.get("data", {}).items():
+        for shop_id, shop_info in shop_data.items():
+            shop_metadata = shop_info.get("data", {})
+            dates = shop_info.get("dates", {})
+
+            for timestamp, ts_info in dates.items():
+                row = {
+                    "shop_id": shop_metadata.get("id"),
+                    "shop_name": shop_metadata.get("name"),
+                    "datetime": ts_info["data"].get("dt"),
+                }
+                for kpi, value in ts_info["data"].items():
+                    if kpi != "dt":
+                        row[kpi] = float(value) if isinstance(value, str) and value.replace('.', '', 1).isdigit() else value
+
+                records.append(row)
+
+    df = pd.DataFrame(records)
+
+    if not df.empty:
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        df['hour'] = df['datetime'].dt.hour
+        df['day'] = df['datetime'].dt.day_name()
+        df = df.sort_values("datetime", kind="stable")
+
+    return df
+
+
+def measure(fn, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = fn(payload)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, min(timings), peak
+
+
+def assert_same_output(new, old):
+    # Het compacte schema laat `day` weg en slaat KPI's op als float32
+    old = old.drop(columns=["day"], errors="ignore")
+    assert list(new.columns) == list(old.columns), (list(new.columns), list(old.columns))
+    assert new.index.equals(old.index)
+    for column in old.columns:
+        if pd.api.types.is_numeric_dtype(old[column]):
+            np.testing.assert_allclose(new[column].to_numpy(dtype="float64"), old[column].to_numpy(dtype="float64"), rtol=1e-6)
+        else:
+            assert (new[column].astype(object) == old[column].astype(object)).all(), column
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shops", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    payload = generate_payload(n_shops=args.shops, n_days=args.days)
+    old, old_time, old_peak = measure(legacy_normalize_vemcount_response, payload, args.repeat)
+    new, new_time, new_peak = measure(normalize_vemcount_response, payload, args.repeat)
+    assert_same_output(new, old)
+
+    mb = 1024 * 1024
+    print(f"rijen: {len(new):,}")
+    print(f"legacy   : {old_time * 1000:8.1f} ms  piek {old_peak / mb:7.1f} MB  frame {old.memory_usage(deep=True).sum() / mb:6.1f} MB")
+    print(f"kolommen : {new_time * 1000:8.1f} ms  piek {new_peak / mb:7.1f} MB  frame {new.memory_usage(deep=True).sum() / mb:6.1f} MB")
+    print(f"speedup  : {old_time / new_time:.1f}x, piekgeheugen {old_peak / new_peak:.1f}x lager")
+
+
+if __name__ == "__main__":
+    main()
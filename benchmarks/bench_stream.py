@@ -0,0 +1,59 @@
+"""Vergelijk streaming ingest (ijson) met response.json() + normalize op dezelfde payload.
+
+    python benchmarks/bench_stream.py --shops 10 --days 365
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
+
+from data_transformer import normalize_vemcount_response, normalize_vemcount_stream
+from benchmarks.bench_normalize import assert_same_output
+from benchmarks.synthetic import generate_payload
+
+
+def via_json(raw):
+    return normalize_vemcount_response(json.loads(raw))
+
+
+def via_stream(raw):
+    return normalize_vemcount_stream(io.BytesIO(raw))
+
+
+def measure(fn, raw):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = fn(raw)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shops", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    raw = json.dumps(generate_payload(n_shops=args.shops, n_days=args.days)).encode("utf-8")
+    old, old_time, old_peak = measure(via_json, raw)
+    new, new_time, new_peak = measure(via_stream, raw)
+    assert_same_output(new, old)
+    assert new.dtypes.equals(old.dtypes)
+
+    mb = 1024 * 1024
+    frame_mb = new.memory_usage(deep=True).sum() / mb
+    print(f"payload: {len(raw) / mb:.1f} MB, rijen: {len(new):,}, frame: {frame_mb:.1f} MB")
+    print(f"json + normalize : {old_time * 1000:8.1f} ms  piek {old_peak / mb:7.1f} MB")
+    print(f"streaming        : {new_time * 1000:8.1f} ms  piek {new_peak / mb:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Benchmark-suite voor de dead-hour pijplijn tegen een lokale Vemcount stand-in.
+
+Meet per stage (fetch, parse, normalize, aggregate, simulate, sweep, forecast, render-prep) de tijd en het
+piekgeheugen, en vergelijkt met eerdere runs om regressies te vangen:
+
+    python -m benchmarks.run --shops 10 --days 90 --save
+    python -m benchmarks.run --shops 10 --days 90 --compare latest --threshold 0.25
+"""
+
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stub_server import VemcountStubServer
+from data_transformer import normalize_vemcount_response
+from deadhour.formatting import format_eur, format_eur2, format_pct
+from deadhour.pipeline import KPI_OUTPUTS
+from deadhour_engine import best_deadhours_per_weekday, find_deadhours_and_simulate
+from slot_cube import SlotCube
+from slot_forecast import SlotForecaster
+from vemcount_client import VemcountClient
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+MB = 1024 * 1024
+
+
+def measure(fn, repeat):
+    """Beste en mediane wall time over `repeat` runs, plus piekgeheugen van een aparte run onder tracemalloc."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"seconds": min(timings), "median_seconds": statistics.median(timings), "peak_mb": peak / MB}
+
+
+def check_sweep_matches_simulation(df, start_date, end_date, start_hour, end_hour):
+    """Gemiddelde, onbeperkte uplift en drempel 0 moeten per winkel de simulatie-som geven, ook met
+    uren zonder omzet (gesloten of leeg, zoals in de praktijk aan de randen van de dag)."""
+    df = df.copy()
+    closed = (df["datetime"].dt.dayofweek == 0) & (df["hour"] == start_hour)
+    df.loc[closed, ["turnover", "sales_per_visitor", "conversion_rate"]] = 0
+    cube = SlotCube()
+    cube.update(df)
+    shop_ids = sorted(df["shop_id"].unique())
+    sweep = cube.sweep(shop_ids, start_date, end_date, start_hour, end_hour, percentiles=(), uplifts=(np.inf,), min_visitors=(0,))
+    full = sweep[(sweep["start_hour"] == start_hour) & (sweep["end_hour"] == end_hour)].set_index("shop_id")["extra_turnover"]
+    expected = find_deadhours_and_simulate(df, group_keys=["shop_id"]).groupby("shop_id")["extra_turnover"].sum()
+    np.testing.assert_allclose(full.loc[expected.index].to_numpy(), expected.to_numpy(), rtol=1e-6)
+
+
+def check_formatting_matches_helpers():
+    """De kolom-formatters moeten cel voor cel gelijk zijn aan de oude per-cel helpers uit de pagina's,
+    ook voor ontbrekende waarden (None, pd.NA → "€0"), NaN, tekst en waarden precies op een afrondingsgrens."""
+    def old_helper(template, fallback):
+        def fmt(x):
+            try:
+                return template.format(float(x)).replace(",", "X").replace(".", ",").replace("X", ".")
+            except Exception:
+                return fallback
+        return fmt
+
+    cells = [1234.5, -0.5, 0.35, 2.675, 1e13 + 0.5, np.nan, np.inf, None, pd.NA, "12,5", "abc", 7]
+    columns = {
+        "object": pd.Series(cells, dtype=object),
+        "Float64": pd.Series([1234.5, None, 0.35, pd.NA], dtype="Float64"),
+        "Int64": pd.Series([1234, None, -7], dtype="Int64"),
+        "float64": pd.Series([1234.5, None, 0.125, np.nan]),
+    }
+    helpers = [(format_eur, old_helper("€{:,.0f}", "€0")), (format_eur2, old_helper("€{:,.2f}", "€0,00")),
+               (format_pct, old_helper("{:,.1f}%", "0,0%"))]
+    for name, values in columns.items():
+        for new, old in helpers:
+            expected = [old(v) for v in values]
+            assert list(new(values)) == expected, (name, new.__name__, list(new(values)), expected)
+
+
+def run_suite(n_shops, n_days, start_hour, end_hour, repeat=3, first_shop_id=30000):
+    shop_ids = list(range(first_shop_id, first_shop_id + n_shops))
+    start_date = date(2024, 1, 1)
+    end_date = start_date + timedelta(days=n_days - 1)
+    stages, info = {}, {}
+
+    with VemcountStubServer() as server:
+        client = VemcountClient(server.url, pool_size=1)
+        url = client.build_url(shop_ids, start_date, end_date, start_hour, end_hour, KPI_OUTPUTS)
+
+        body, stages["fetch"] = measure(lambda: client.session.post(url, timeout=client.timeout).content, repeat)
+        info["payload_mb"] = len(body) / MB
+
+    raw, stages["parse"] = measure(lambda: json.loads(body), repeat)
+    df, stages["normalize"] = measure(lambda: normalize_vemcount_response(raw), repeat)
+    info["rows"] = len(df)
+    info["frame_mb"] = df.memory_usage(deep=True).sum() / MB
+
+    try:
+        from data_transformer import normalize_vemcount_stream
+        _, stages["stream_normalize"] = measure(lambda: normalize_vemcount_stream(io.BytesIO(body)), repeat)
+    except ImportError:
+        pass
+
+    def aggregate():
+        cube = SlotCube()
+        cube.update(df)
+        return cube
+
+    cube, stages["aggregate"] = measure(aggregate, repeat)
+    results, stages["simulate"] = measure(
+        lambda: cube.simulate(shop_ids, start_date, end_date, start_hour, end_hour, group_keys=["shop_id"]), repeat)
+
+    _, stages["sweep"] = measure(lambda: cube.sweep(shop_ids, start_date, end_date, start_hour, end_hour), repeat)
+    check_sweep_matches_simulation(df, start_date, end_date, start_hour, end_hour)
+
+    def forecast():
+        # Koude fit per run: een nieuwe forecaster, zodat de volledige batch-fit gemeten wordt
+        cube.forecaster = SlotForecaster()
+        return cube.project(results, end_date + timedelta(days=1), end_date + timedelta(days=182))
+
+    _, stages["forecast"] = measure(forecast, repeat)
+
+    def render_prep():
+        return {shop_id: best_deadhours_per_weekday(part, min_visitors=2, weken_over=52)
+                for shop_id, part in results.groupby("shop_id", sort=False)}
+
+    _, stages["render_prep"] = measure(render_prep, repeat)
+    check_formatting_matches_helpers()
+    return stages, info
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _latest_result():
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+    return paths[-1] if paths else None
+
+
+def compare(current, baseline, threshold):
+    """Geeft de lijst van stages terug die meer dan `threshold` (fractie) trager of zwaarder zijn geworden."""
+    if current["params"] != baseline["params"]:
+        print("⚠️  Parameters wijken af van de baseline; vergelijking is indicatief.")
+    regressions = []
+    print(f"\n{'stage':<18}{'tijd':>12}{'baseline':>12}{'Δ':>9}{'piek':>10}{'baseline':>10}{'Δ':>9}")
+    for stage, now in current["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before is None:
+            continue
+        dt = now["seconds"] / before["seconds"] - 1 if before["seconds"] else 0.0
+        dm = now["peak_mb"] / before["peak_mb"] - 1 if before["peak_mb"] else 0.0
+        flag = ""
+        if dt > threshold or dm > threshold:
+            regressions.append(stage)
+            flag = "  ← regressie"
+        print(f"{stage:<18}{now['seconds'] * 1000:>10.1f}ms{before['seconds'] * 1000:>10.1f}ms{dt:>+9.0%}"
+              f"{now['peak_mb']:>8.1f}MB{before['peak_mb']:>8.1f}MB{dm:>+9.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shops", type=int, default=10)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--hours", default="9-19", help="Openingstijden als van-tot (standaard 9-19).")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", action="store_true", help=f"Bewaar het resultaat in {RESULTS_DIR}.")
+    parser.add_argument("--compare", default=None, help="Pad naar een eerder resultaat, of 'latest'.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Toegestane verslechtering als fractie (standaard 0.25).")
+    args = parser.parse_args(argv)
+
+    start_hour, end_hour = (int(part) for part in args.hours.split("-"))
+    baseline_path = _latest_result() if args.compare == "latest" else args.compare
+
+    stages, info = run_suite(args.shops, args.days, start_hour, end_hour, repeat=args.repeat)
+    current = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+        },
+        "params": {"shops": args.shops, "days": args.days, "hours": args.hours},
+        "info": info,
+        "stages": stages,
+    }
+
+    print(f"{args.shops} winkels × {args.days} dagen × {args.hours}: {info['rows']:,} rijen, "
+          f"payload {info['payload_mb']:.1f} MB, frame {info['frame_mb']:.1f} MB")
+    print(f"{'stage':<18}{'best':>10}{'mediaan':>10}{'piek':>10}")
+    for stage, m in stages.items():
+        print(f"{stage:<18}{m['seconds'] * 1000:>8.1f}ms{m['median_seconds'] * 1000:>8.1f}ms{m['peak_mb']:>8.1f}MB")
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as fh:
+            regressions = compare(current, json.load(fh), args.threshold)
+
+    if args.save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+        with open(path, "w") as fh:
+            json.dump(current, fh, indent=2)
+        print(f"\nResultaat opgeslagen in {path}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
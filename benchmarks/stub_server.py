@@ -0,0 +1,83 @@
+"""Lokale stand-in voor de Vemcount API: genereert synthetische payloads op basis van de query.
+
+    with VemcountStubServer() as server:
+        client = VemcountClient(server.url)
+"""
+
+import json
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic import generate_payload
+
+
+def payload_for_query(query):
+    start_date = date.fromisoformat(query["form_date_from"][0])
+    end_date = date.fromisoformat(query["form_date_to"][0])
+    start_hour = int(query.get("show_hours_from", ["00:00"])[0][:2])
+    end_hour = int(query.get("show_hours_to", ["24:00"])[0][:2])
+    kpis = query.get("data_output") or None
+
+    shops = {}
+    for shop_id in query.get("data", []):
+        # Per winkel een vaste seed: dezelfde query geeft altijd dezelfde data
+        payload = generate_payload(
+            n_shops=1, n_days=(end_date - start_date).days + 1, start_hour=start_hour, end_hour=end_hour,
+            start_date=start_date, first_shop_id=int(shop_id), seed=int(shop_id),
+            **({"kpis": kpis} if kpis else {}),
+        )
+        shops.update(payload["data"][start_date.isoformat()])
+    return {"data": {start_date.isoformat(): shops}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        query = parse_qs(urlparse(self.path).query)
+        body = json.dumps(payload_for_query(query)).encode("utf-8")
+        self.server.requests.append(query)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+class VemcountStubServer:
+    def __init__(self, host="127.0.0.1", port=0, handler=_Handler):
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._server.requests = []
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def requests(self):
+        return self._server.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
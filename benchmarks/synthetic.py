@@ -0,0 +1,40 @@
+"""Generator voor Vemcount-achtige JSON-payloads (data -> datum -> shop -> dates)."""
+
+from datetime import date, timedelta
+import random
+
+DEFAULT_KPIS = ["count_in", "conversion_rate", "turnover", "sales_per_visitor", "sales_per_transaction"]
+
+
+def _kpi_values(rng, kpis, hour):
+    # Drukte piekt rond het middaguur; genoeg variatie om dead hours te laten ontstaan
+    visitors = max(0, int(rng.gauss(40 - abs(hour - 13) * 4, 8)))
+    conversion = max(0.0, min(1.0, rng.gauss(0.22, 0.06)))
+    atv = max(1.0, rng.gauss(45.0, 12.0))
+    transactions = visitors * conversion
+    turnover = transactions * atv
+    values = {
+        "count_in": visitors,
+        "conversion_rate": round(conversion * 100, 2),
+        "turnover": round(turnover, 2),
+        "sales_per_visitor": round(turnover / visitors, 2) if visitors else 0.0,
+        "sales_per_transaction": round(atv, 2),
+        "transactions": round(transactions),
+    }
+    return {kpi: str(values.get(kpi, round(rng.random() * 100, 2))) for kpi in kpis}
+
+
+def generate_payload(n_shops=10, n_days=30, start_hour=9, end_hour=19, kpis=DEFAULT_KPIS,
+                     start_date=date(2024, 1, 1), first_shop_id=30000, seed=42):
+    rng = random.Random(seed)
+    shops = {}
+    for s in range(n_shops):
+        shop_id = first_shop_id + s
+        dates = {}
+        for d in range(n_days):
+            day = start_date + timedelta(days=d)
+            for hour in range(start_hour, end_hour):
+                dt = f"{day.isoformat()} {hour:02d}:00:00"
+                dates[dt] = {"data": {"dt": dt, **_kpi_values(rng, kpis, hour)}}
+        shops[str(shop_id)] = {"data": {"id": shop_id, "name": f"Shop {shop_id}"}, "dates": dates}
+    return {"data": {start_date.isoformat(): shops}}
@@ -1,33 +1,207 @@
+from itertools import chain
+from operator import itemgetter
+
+import numpy as np
 import pandas as pd
 
+def _collect_hour_rows(response_json):
+    shop_ids, shop_names, rows = [], [], []
+    for shop_data in response_json.get("data", {}).values():
+        for shop_info in shop_data.values():
+            shop_metadata = shop_info.get("data", {})
+            shop_rows = [ts_info["data"] for ts_info in shop_info.get("dates", {}).values()]
+            rows.extend(shop_rows)
+            shop_ids.extend([shop_metadata.get("id")] * len(shop_rows))
+            shop_names.extend([shop_metadata.get("name")] * len(shop_rows))
+    return shop_ids, shop_names, rows
+
+
+def _to_float_array(values):
+    # Snel pad: NumPy parseert numerieke strings (ook negatief) en None → NaN in één keer
+    try:
+        return np.asarray(values, dtype="float64")
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce").to_numpy(dtype="float64")
+
+
+# Compact schema: één rij per (winkel, uur) van ~34 bytes. Weekdag- en uurlabels worden
+# pas bij de weergave gemaakt (deadhour_engine.label_slots).
+KPI_DTYPE = "float32"
+META_COLUMNS = ("shop_id", "shop_name", "datetime", "hour")
+
+
+def compact_kpi_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Breng een (ouder of samengevoegd) uurframe terug naar het compacte schema:
+    float32 KPI's, int8 `hour`, categorische `shop_name` en geen `day`-kolom."""
+    if df.empty:
+        return df
+    df = df.drop(columns=["day"], errors="ignore")
+    dtypes = {kpi: KPI_DTYPE for kpi in df.columns if kpi not in META_COLUMNS and df[kpi].dtype != KPI_DTYPE}
+    if "hour" in df.columns and df["hour"].dtype != "int8":
+        dtypes["hour"] = "int8"
+    if "shop_name" in df.columns and not isinstance(df["shop_name"].dtype, pd.CategoricalDtype):
+        dtypes["shop_name"] = "category"
+    return df.astype(dtypes) if dtypes else df
+
+
+def build_kpi_frame(shop_ids, shop_names, datetimes, kpi_columns):
+    """Bouw het genormaliseerde frame uit kolombuffers van gelijke lengte.
+
+    `kpi_columns` is een dict {kpi: lijst waarden} of een tuple (kpis, 2D float-array).
+    """
+    if len(datetimes) == 0:
+        return pd.DataFrame()
+
+    if not isinstance(datetimes, np.ndarray):
+        datetimes = pd.to_datetime(pd.Series(datetimes, dtype="object"))
+    df = pd.DataFrame({
+        "shop_id": pd.array(shop_ids, dtype="Int32") if None in shop_ids else np.asarray(shop_ids, dtype="int32"),
+        "shop_name": pd.Categorical(shop_names),
+        "datetime": datetimes,
+    })
+    if isinstance(kpi_columns, dict):
+        for kpi, values in kpi_columns.items():
+            df[kpi] = _to_float_array(values).astype(KPI_DTYPE)
+    else:
+        kpis, matrix = kpi_columns
+        matrix = matrix.astype(KPI_DTYPE)
+        for i, kpi in enumerate(kpis):
+            df[kpi] = matrix[:, i]
+
+    df["hour"] = df["datetime"].dt.hour.astype("int8")
+    return df.sort_values("datetime", kind="stable")
+
+
+def _kpi_matrix(rows, kpis):
+    # Snel pad als elke rij alle KPI's heeft: één itemgetter-pass en één bulk-conversie naar float
+    try:
+        values = list(map(itemgetter(*kpis), rows)) if len(kpis) > 1 else [(v,) for v in map(itemgetter(*kpis), rows)]
+        return kpis, np.asarray(values, dtype="float64").reshape(len(rows), len(kpis))
+    except (KeyError, TypeError, ValueError):
+        return {kpi: [row.get(kpi) for row in rows] for kpi in kpis}
+
+
 def normalize_vemcount_response(response_json):
-    records = []
+    shop_ids, shop_names, rows = _collect_hour_rows(response_json)
+    if not rows:
+        return pd.DataFrame()
+
+    # Kolommen in volgorde van eerste voorkomen, net als pd.DataFrame(records) deed
+    kpis = [kpi for kpi in dict.fromkeys(chain.from_iterable(rows)) if kpi != "dt"]
+    datetimes = [row.get("dt") for row in rows]
+
+    return build_kpi_frame(shop_ids, shop_names, datetimes, _kpi_matrix(rows, kpis))
+
+
+# -----------------------------
+# Streaming ingest
+# -----------------------------
+STREAM_CHUNK_ROWS = 50_000
+
+
+class _StreamBuffers:
+    """Kolombuffers die elke `chunk_rows` rijen naar NumPy-arrays worden omgezet,
+    zodat er nooit meer dan één chunk aan Python-strings tegelijk in geheugen staat."""
+
+    def __init__(self, chunk_rows):
+        self.chunk_rows = chunk_rows
+        self.shop_ids, self.shop_names = [], []
+        self.datetimes, self.dt_chunks = [], []
+        self.kpis = {}        # kpi -> lopende lijst
+        self.kpi_chunks = {}  # kpi -> [arrays]
+        self.chunk_sizes = []
+
+    def add_kpi(self, kpi):
+        self.kpis[kpi] = [None] * len(self.datetimes)
+        self.kpi_chunks[kpi] = [np.full(size, np.nan) for size in self.chunk_sizes]
+
+    def end_row(self, dt):
+        self.datetimes.append(dt)
+        n = len(self.datetimes)
+        for column in self.kpis.values():
+            if len(column) < n:
+                column.append(None)
+        if n >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.datetimes:
+            return
+        self.dt_chunks.append(pd.to_datetime(pd.Series(self.datetimes, dtype="object")).to_numpy())
+        for kpi, column in self.kpis.items():
+            self.kpi_chunks[kpi].append(_to_float_array(column))
+            self.kpis[kpi] = []
+        self.chunk_sizes.append(len(self.datetimes))
+        self.datetimes = []
+
+    def to_frame(self):
+        self.flush()
+        if not self.chunk_sizes:
+            return pd.DataFrame()
+        datetimes = np.concatenate(self.dt_chunks)
+        kpi_columns = {kpi: np.concatenate(chunks) for kpi, chunks in self.kpi_chunks.items()}
+        return build_kpi_frame(self.shop_ids, self.shop_names, datetimes, kpi_columns)
 
-    for date_key, shop_data in response_json.get("data", {}).items():
-        for shop_id, shop_info in shop_data.items():
-            shop_metadata = shop_info.get("data", {})
-            dates = shop_info.get("dates", {})
 
-            for timestamp, ts_info in dates.items():
-                row = {
-                    "shop_id": shop_metadata.get("id"),
-                    "shop_name": shop_metadata.get("name"),
-                    "datetime": ts_info["data"].get("dt"),
-                }
+def normalize_vemcount_stream(fileobj, chunk_rows=STREAM_CHUNK_ROWS):
+    """Streaming variant van normalize_vemcount_response voor een bestand of HTTP-body.
 
-                # Voeg alle andere KPI's toe (zoals sales_per_visitor, conversion_rate, enz.)
-                for kpi, value in ts_info["data"].items():
-                    if kpi != "dt":
-                        row[kpi] = float(value) if isinstance(value, str) and value.replace('.', '', 1).isdigit() else value
+    Parseert de JSON event-gebaseerd (ijson) en schrijft rijen direct in kolombuffers,
+    zonder de volledige dict-boom op te bouwen. Levert hetzelfde frame op.
+    """
+    try:
+        import ijson
+    except ImportError as e:
+        raise ImportError("Streaming ingest vereist het pakket 'ijson' (pip install ijson).") from e
 
-                records.append(row)
+    buffers = _StreamBuffers(chunk_rows)
+    # Pad: data -> datum -> shop -> ("data" -> id/name | "dates" -> ts -> "data" -> kpi)
+    keys = []
+    shop_start = shop_id = shop_name = None
+    in_row = False
+    row_dt = None
 
-    df = pd.DataFrame(records)
+    for event, value in ijson.basic_parse(fileobj, use_float=True):
+        if event == "map_key":
+            keys[-1] = value
+            continue
 
-    if not df.empty:
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        df['hour'] = df['datetime'].dt.hour
-        df['day'] = df['datetime'].dt.day_name()
-        df = df.sort_values("datetime")
+        depth = len(keys)
+        if event == "start_map":
+            if depth == 3 and keys[0] == "data":
+                shop_start, shop_id, shop_name = len(buffers.shop_ids), None, None
+            elif depth == 6 and keys[0] == "data" and keys[3] == "dates" and keys[5] == "data":
+                in_row, row_dt = True, None
+                buffers.shop_ids.append(None)
+            keys.append(None)
+        elif event == "end_map":
+            keys.pop()
+            depth -= 1
+            if depth == 6 and in_row:
+                in_row = False
+                buffers.end_row(row_dt)
+            elif depth == 3 and shop_start is not None:
+                # Shop-metadata kan vóór of na "dates" staan: achteraf invullen
+                n = len(buffers.shop_ids) - shop_start
+                buffers.shop_ids[shop_start:] = [shop_id] * n
+                buffers.shop_names.extend([shop_name] * n)
+                shop_start = None
+        elif event == "start_array":
+            keys.append(None)
+        elif event == "end_array":
+            keys.pop()
+        elif in_row and depth == 7:
+            kpi = keys[6]
+            if kpi == "dt":
+                row_dt = value
+            else:
+                if kpi not in buffers.kpis:
+                    buffers.add_kpi(kpi)
+                buffers.kpis[kpi].append(value)
+        elif depth == 5 and keys[0] == "data" and keys[3] == "data":
+            if keys[4] == "id":
+                shop_id = value
+            elif keys[4] == "name":
+                shop_name = value
 
-    return df
+    return buffers.to_frame()
@@ -0,0 +1,57 @@
+"""Dead Hour Optimizer als library: ophalen, normaliseren en simuleren zonder Streamlit.
+
+Exports worden lazy geladen, zodat `import deadhour` geen pandas, requests of pyarrow
+binnenhaalt tot een functie echt gebruikt wordt:
+
+    from deadhour import VemcountClient, find_deadhours_and_simulate
+"""
+
+import importlib
+
+_EXPORTS = {
+    "normalize_vemcount_response": "data_transformer",
+    "normalize_vemcount_stream": "data_transformer",
+    "VemcountClient": "vemcount_client",
+    "VemcountAPIError": "vemcount_client",
+    "fetch_many": "vemcount_client",
+    "WEEKDAYS": "deadhour_engine",
+    "add_slot_columns": "deadhour_engine",
+    "find_deadhours_and_simulate": "deadhour_engine",
+    "deadhour_matrix": "deadhour_engine",
+    "chain_summary": "deadhour_engine",
+    "sweep_scenarios": "deadhour_engine",
+    "SlotCube": "slot_cube",
+    "simulate_from_cube": "slot_cube",
+    "bootstrap_from_cube": "slot_cube",
+    "SlotForecaster": "slot_forecast",
+    "KPICache": "kpi_cache",
+    "HourlyKPIStore": "fetch_planner",
+    "ParquetKPIStore": "kpi_warehouse",
+    "KPI_OUTPUTS": "deadhour.pipeline",
+    "load_kpi_data": "deadhour.pipeline",
+    "load_kpi_data_many": "deadhour.pipeline",
+    "StageMetrics": "deadhour.metrics",
+    "REGISTRY": "deadhour.metrics",
+    "SHOP_NAME_MAP": "shop_mapping",
+    "format_frame": "deadhour.formatting",
+    "ResultCache": "deadhour.shared",
+    "SingleFlight": "deadhour.shared",
+    "FixtureStore": "deadhour.replay",
+    "RecordingClient": "deadhour.replay",
+    "ReplayServer": "deadhour.replay",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'deadhour' has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,20 @@
+import argparse
+import sys
+
+from deadhour import batch, prefetch, replay
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m deadhour", description="Dead Hour Optimizer zonder browser.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    batch.add_arguments(commands.add_parser("batch", help="Draai de dead-hour analyse voor alle winkels en schrijf CSV/Parquet."))
+    prefetch.add_arguments(commands.add_parser("prefetch", help="Houd het KPI-warehouse periodiek warm voor alle winkels."))
+    replay.add_record_arguments(commands.add_parser("record", help="Neem API-responses op als gecomprimeerde fixtures."))
+    replay.add_replay_arguments(commands.add_parser("replay", help="Serveer opgenomen fixtures als lokale Vemcount API."))
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Nachtelijke ketenrapportage: fetch → normalize → simulate per winkel over een process pool.
+
+    python -m deadhour batch --days 30 --hours 9-19 --output reports/deadhours.parquet
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import pandas as pd
+
+from deadhour.cli import parse_hours, resolve_api_url
+from deadhour.pipeline import KPI_OUTPUTS
+from deadhour_engine import find_deadhours_and_simulate
+from shop_mapping import SHOP_NAME_MAP
+from vemcount_client import VemcountClient
+
+CSV_DECIMALS = 4
+
+_client = None  # één client (en connection pool) per worker-proces
+
+
+def _init_worker(api_url, timeout):
+    global _client
+    _client = VemcountClient(api_url, pool_size=1, timeout=(5, timeout))
+
+
+def analyse_shop(shop_id, start_date, end_date, start_hour, end_hour, kpis=KPI_OUTPUTS):
+    df = _client.fetch_kpis(shop_id, start_date, end_date, start_hour, end_hour, kpis)
+    if df.empty:
+        return shop_id, pd.DataFrame()
+    results = find_deadhours_and_simulate(df)
+    results.insert(0, "shop_name", SHOP_NAME_MAP.get(shop_id, str(shop_id)))
+    results.insert(0, "shop_id", shop_id)
+    return shop_id, results
+
+
+def write_results(df: pd.DataFrame, output):
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    if output.endswith(".parquet"):
+        df.to_parquet(output, index=False)
+    else:
+        # De KPI's zijn float32: zonder afronden komen waarden als 16.59000015258789 in de CSV
+        floats = df.select_dtypes("float").columns
+        df.round({column: CSV_DECIMALS for column in floats}).to_csv(output, index=False)
+
+
+def run_batch(shop_ids, start_date, end_date, start_hour, end_hour, api_url, workers=None, timeout=60.0):
+    """Geeft (resultaten voor alle winkels, {shop_id: foutmelding}) terug."""
+    frames, failures = [], {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(api_url, timeout)) as pool:
+        futures = {
+            pool.submit(analyse_shop, shop_id, start_date, end_date, start_hour, end_hour): shop_id
+            for shop_id in shop_ids
+        }
+        for future in as_completed(futures):
+            shop_id = futures[future]
+            try:
+                _, results = future.result()
+            except Exception as e:
+                failures[shop_id] = str(e)
+                continue
+            if results.empty:
+                failures[shop_id] = "lege dataset"
+            else:
+                frames.append(results)
+
+    if not frames:
+        return pd.DataFrame(), failures
+    combined = pd.concat(frames, ignore_index=True)
+    return combined.sort_values(["shop_id", "extra_turnover"], ascending=[True, False]), failures
+
+
+def add_arguments(parser):
+    parser.add_argument("--shops", default="all", help="Komma-gescheiden shop-ID's of 'all' (standaard: alle winkels uit SHOP_NAME_MAP).")
+    parser.add_argument("--days", type=int, default=30, help="Aantal dagen terug vanaf --end-date (standaard 30).")
+    parser.add_argument("--end-date", default=None, help="Laatste dag (YYYY-MM-DD, standaard vandaag).")
+    parser.add_argument("--hours", type=parse_hours, default=(9, 19), help="Openingstijden als van-tot, bijv. 9-19.")
+    parser.add_argument("--workers", type=int, default=None, help="Aantal worker-processen (standaard: aantal cores).")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Read-timeout per API-request in seconden.")
+    parser.add_argument("--api-url", default=None)
+    parser.add_argument("--output", default="deadhours.csv", help="Uitvoerbestand; .parquet of .csv.")
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    shop_ids = list(SHOP_NAME_MAP) if args.shops == "all" else [int(s) for s in args.shops.split(",")]
+    end_date = date.fromisoformat(args.end_date) if args.end_date else date.today()
+    start_date = end_date - timedelta(days=args.days)
+    start_hour, end_hour = args.hours
+
+    started = time.perf_counter()
+    results, failures = run_batch(shop_ids, start_date, end_date, start_hour, end_hour,
+                                  resolve_api_url(args.api_url), workers=args.workers, timeout=args.timeout)
+    for shop_id, message in sorted(failures.items()):
+        print(f"{SHOP_NAME_MAP.get(shop_id, shop_id)} ({shop_id}): {message}", file=sys.stderr)
+
+    if not results.empty:
+        write_results(results, args.output)
+    print(f"{len(shop_ids) - len(failures)}/{len(shop_ids)} winkels, {len(results)} rijen → {args.output} "
+          f"({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+    return 1 if failures else 0
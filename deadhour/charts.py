@@ -0,0 +1,170 @@
+"""Plotly-figuren voor de dead-hour pagina's: gecachet op input-hash en licht voor de browser.
+
+Labels en hovers worden client-side geformatteerd (texttemplate + EU-separators in de layout)
+in plaats van per rij een string in Python te maken en mee te sturen. Boven `max_cells`
+worden views automatisch geaggregeerd, zodat de websocket-payload begrensd blijft.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import sample_colorscale
+
+from deadhour.shared import frame_digest
+from deadhour_engine import WEEKDAYS, deadhour_matrix
+
+EU_SEPARATORS = ",."  # decimaal-komma, duizendtal-punt (d3-format)
+MAX_HEATMAP_CELLS = 20_000
+HOUR_BLOCKS = (1, 2, 3, 4, 6, 12, 24)
+FIGURE_CACHE_SIZE = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def cached_figure(name, builder, *frames, **params) -> go.Figure:
+    """Bouw `builder(*frames, **params)` één keer per unieke input; de figuur wordt gedeeld, dus niet muteren."""
+    key = (name, frame_digest(*frames, **params))
+    with _cache_lock:
+        fig = _cache.get(key)
+        if fig is not None:
+            _cache.move_to_end(key)
+            return fig
+    fig = builder(*frames, **params)
+    with _cache_lock:
+        _cache[key] = fig
+        while len(_cache) > FIGURE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return fig
+
+
+def clear_figure_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+# -----------------------------
+# Sterkste dead hour per weekdag
+# -----------------------------
+def deadhour_bar_figure(best_deadhours: pd.DataFrame, title="Dead Hours met hoogste omzetpotentie per weekdag") -> go.Figure:
+    """Horizontale bars per weekdag, één trace per uur (Viridis), labels als €-bedrag zonder decimalen."""
+    hours = sorted(best_deadhours["hour"].unique())
+    colors = sample_colorscale("Viridis", np.linspace(0, 1, len(hours))) if len(hours) > 1 else sample_colorscale("Viridis", [0])
+    fig = go.Figure()
+    for hour, color in zip(hours, colors):
+        part = best_deadhours[best_deadhours["hour"] == hour]
+        fig.add_trace(go.Bar(
+            x=part["extra_turnover"].to_numpy(),
+            y=part["weekday"].astype(str).to_numpy(),
+            name=str(hour),
+            orientation="h",
+            marker_color=color,
+            texttemplate="%{x:,.0f}",
+            textposition="outside",
+            hovertemplate=f"%{{y}} • €%{{x:,.0f}}<br>Uur: {hour}<extra></extra>",
+        ))
+    fig.update_layout(
+        title=title,
+        separators=EU_SEPARATORS,
+        barmode="relative",
+        legend_title_text="Uur",
+        xaxis_title="Extra omzet (€)",
+        # Maandag bovenaan, zoals px.bar met category_orders
+        yaxis={"title": "Weekdag", "categoryorder": "array", "categoryarray": WEEKDAYS[::-1]},
+    )
+    return fig
+
+
+# -----------------------------
+# Keten-heatmap
+# -----------------------------
+def downsample_matrix(shop_ids, hours, matrix, max_cells=MAX_HEATMAP_CELLS):
+    """Houd winkel × weekdag × uur onder `max_cells`: eerst uren samenvoegen tot blokken,
+    daarna alleen de winkels met de hoogste totale potentie. Geeft ook een toelichting terug."""
+    notes = []
+    n_shops, n_days, n_hours = matrix.shape
+    # Kleinste blokgrootte (deler van 24, dus nette dagdelen) die onder de limiet blijft
+    block = next((b for b in HOUR_BLOCKS if n_shops * n_days * -(-n_hours // b) <= max_cells), HOUR_BLOCKS[-1])
+    block = min(block, max(1, n_hours))
+    if block > 1:
+        pad = -n_hours % block
+        padded = np.pad(matrix, ((0, 0), (0, 0), (0, pad)), constant_values=np.nan)
+        blocks = padded.reshape(n_shops, n_days, -1, block)
+        empty = np.isnan(blocks).all(axis=3)
+        matrix = np.where(empty, np.nan, np.nansum(blocks, axis=3))
+        hours = hours[::block]
+        notes.append(f"uren samengevoegd per {block}")
+
+    cells_per_shop = matrix.shape[1] * matrix.shape[2]
+    max_shops = max(1, max_cells // max(1, cells_per_shop))
+    if matrix.shape[0] > max_shops:
+        keep = np.argsort(-np.nansum(matrix, axis=(1, 2)), kind="stable")[:max_shops]
+        matrix, shop_ids = matrix[keep], shop_ids[keep]
+        notes.append(f"top {max_shops} van {n_shops} winkels op potentie")
+    return shop_ids, hours, matrix, block, notes
+
+
+HEATMAP_COLUMNS = ["shop_id", "weekday_num", "hour_num", "extra_turnover"]
+
+
+def chain_heatmap_figure(results: pd.DataFrame, shop_names=None, max_cells=MAX_HEATMAP_CELLS):
+    """Winkel × (weekdag, uur) heatmap van extra omzet; geeft (figuur, toelichting bij downsampling) terug.
+
+    Heeft alleen HEATMAP_COLUMNS nodig; geef bij cached_figure dat subset mee, dan is hashen goedkoop.
+    """
+    shop_ids, hours, matrix = deadhour_matrix(results)
+    shop_ids, hours, matrix, block, notes = downsample_matrix(shop_ids, hours, matrix, max_cells)
+
+    shop_names = shop_names or {}
+    names = [shop_names.get(int(sid), str(sid)) for sid in shop_ids]
+    if block > 1:
+        columns = [f"{day[:2]} {h:02d}–{min(h + block, 24):02d}" for day in WEEKDAYS for h in hours]
+    else:
+        columns = [f"{day[:2]} {h:02d}:00" for day in WEEKDAYS for h in hours]
+
+    fig = go.Figure(go.Heatmap(
+        z=np.round(matrix.reshape(len(shop_ids), -1), 0),
+        x=columns,
+        y=names,
+        colorscale="Viridis",
+        colorbar={"title": "Extra omzet (€)"},
+        hovertemplate="%{y}<br>%{x}<br>Extra omzet: €%{z:,.0f}<extra></extra>",
+    ))
+    fig.update_layout(
+        title="Extra omzetpotentie per winkel, weekdag en uur",
+        separators=EU_SEPARATORS,
+        height=min(4000, max(400, 22 * len(shop_ids))),
+        xaxis={"title": "Weekdag & uur", "nticks": len(WEEKDAYS) * 4},
+        yaxis={"title": "Winkel", "autorange": "reversed"},
+    )
+    return fig, "; ".join(notes)
+
+
+# -----------------------------
+# Scenario-sweep
+# -----------------------------
+def sweep_heatmap_figure(sweep: pd.DataFrame, title="Extra omzet per doel-SPV en conversie-uplift") -> go.Figure:
+    """Doel × uplift heatmap voor één (venster, minimum bezoekers)-plak van sweep_scenarios."""
+    table = sweep.pivot_table(index="target", columns="uplift", values="extra_turnover", aggfunc="sum", sort=False)
+    table = table[sorted(table.columns)]
+    columns = ["tot doel" if np.isinf(u) else f"+{u * 100:.0f}%" for u in table.columns]
+    fig = go.Figure(go.Heatmap(
+        z=np.round(table.to_numpy(), 0),
+        x=columns,
+        y=table.index.tolist(),
+        colorscale="Viridis",
+        colorbar={"title": "Extra omzet (€)"},
+        texttemplate="€%{z:,.0f}",
+        hovertemplate="Doel %{y} · uplift %{x}<br>Extra omzet: €%{z:,.0f}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=title,
+        separators=EU_SEPARATORS,
+        xaxis={"title": "Conversie-uplift (per slot, hoogstens tot doel)"},
+        yaxis={"title": "Doel-SPV", "autorange": "reversed"},
+    )
+    return fig
+
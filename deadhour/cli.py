@@ -0,0 +1,28 @@
+"""Kleine helpers die de CLI-commando's (batch, prefetch, record, replay) delen.
+
+Bewust zonder pandas/requests-imports: elk commando laadt alleen wat het zelf nodig heeft.
+"""
+
+import os
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+
+def parse_hours(value):
+    """'9-19' → (9, 19)."""
+    start, end = (int(part) for part in value.split("-"))
+    return start, end
+
+
+def resolve_api_url(api_url=None):
+    """--api-url, anders $API_URL, anders API_URL uit .streamlit/secrets.toml."""
+    if api_url:
+        return api_url
+    if os.environ.get("API_URL"):
+        return os.environ["API_URL"]
+    try:
+        import tomllib
+        with open(SECRETS_PATH, "rb") as fh:
+            return tomllib.load(fh)["API_URL"]
+    except (OSError, KeyError):
+        raise SystemExit("Geen API_URL gevonden: geef --api-url mee, zet $API_URL of vul .streamlit/secrets.toml.")
@@ -0,0 +1,145 @@
+"""EU-notatie voor hele kolommen tegelijk ("€1.234", "12,3%", "1.234").
+
+Zelfde uitvoer als de oude per-cel helpers ("€{:,.0f}".format(x) met , en . omgewisseld),
+maar opgebouwd met NumPy string-operaties per kolom in plaats van een Python-call per cel
+(alleen waarden precies op een afrondingsgrens of buiten int64-bereik gaan per cel):
+
+    st.dataframe(format_frame(df, {"Omzet": format_eur, "Conversie (%)": format_pct}))
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _as_float_array(values) -> np.ndarray:
+    """Waarden zoals float(x) in de oude helpers: NaN blijft NaN, maar alles waarop float() faalt
+    (None, pd.NA, tekst die geen getal is) telt als 0, zoals hun except-tak ("€0")."""
+    values = values if isinstance(values, pd.Series) else pd.Series(values, dtype=None if len(values) else "float64")
+    if isinstance(values.dtype, np.dtype) and pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype="float64")
+    if pd.api.types.is_numeric_dtype(values):
+        # Nullable dtypes (Float64, Int64): pd.NA wordt 0, een echte NaN blijft "nan"
+        return values.to_numpy(dtype="float64", na_value=0.0)
+    # Object-kolommen (gemengd, tekst) zijn zeldzaam: per cel, precies als de oude helpers
+    return np.fromiter((_to_float(v) for v in values), dtype="float64", count=len(values))
+
+
+# "000" … "999": groepen opzoeken is veel sneller dan int → str per element
+_GROUPS = np.array([f"{i:03d}" for i in range(1000)])
+
+
+def _group_thousands(n: np.ndarray) -> np.ndarray:
+    """Niet-negatieve int64 → strings met '.' als duizendtalscheiding.
+
+    Alle groepen worden op drie cijfers opgevuld en daarna worden voorloopnullen en -punten
+    gestript ("000.012.345" → "12.345"), zodat er geen per-element lus nodig is."""
+    if n.size == 0:
+        return n.astype(str)
+    n_groups = (len(str(int(n.max()))) + 2) // 3
+    text = _GROUPS[n // 1000 ** (n_groups - 1) % 1000]
+    for k in range(n_groups - 2, -1, -1):
+        text = np.char.add(np.char.add(text, "."), _GROUPS[n // 1000 ** k % 1000])
+    text = np.char.lstrip(text, "0.")
+    return np.where(text == "", "0", text)
+
+
+@lru_cache(maxsize=None)
+def _fraction_table(decimals):
+    return np.array([f"{i:0{decimals}d}" for i in range(10 ** decimals)])
+
+
+# Boven 2**40 (geschaald) is de afrondingsfout van x·10**decimals niet meer ruim onder HALF_WAY_TOLERANCE
+EXACT_LIMIT = 2.0 ** 40
+HALF_WAY_TOLERANCE = 1e-3
+
+
+def _format_exact(x, decimals) -> str:
+    return f"{abs(x):,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def format_number_eu(values, decimals=0, prefix="", suffix="") -> np.ndarray:
+    """Formatteer een kolom als "{prefix}{:,.<decimals>f}{suffix}" in EU-notatie; geeft een object-array terug.
+
+    Snel pad: x·10**decimals afronden naar een int64 en de cijfers opzoeken. Dat wijkt alleen af
+    van "{:,.f}" als de geschaalde waarde (vrijwel) precies op een half ligt, want dan beslist de
+    exacte binaire waarde (0,35 → "0,3"), of als hij te groot is voor int64-precisie. Die cellen
+    gaan per stuk via de gewone string-formattering, zodat de uitvoer overal gelijk is aan de oude helpers.
+    Net als voorheen: NaN/inf worden "nan"/"inf"; None, pd.NA en tekst die geen getal is worden als 0 weergegeven.
+    """
+    x = _as_float_array(values)
+    finite = np.isfinite(x)
+    scale = 10 ** decimals
+    scaled_float = np.abs(np.where(finite, x, 0.0)) * scale
+    exact = (scaled_float >= EXACT_LIMIT) | (np.abs(scaled_float % 1 - 0.5) < HALF_WAY_TOLERANCE)
+    scaled = np.rint(np.where(exact, 0.0, scaled_float)).astype("int64")
+
+    text = _group_thousands(scaled // scale)
+    if decimals:
+        text = np.char.add(np.char.add(text, ","), _fraction_table(decimals)[scaled % scale])
+    if exact.any():
+        text = text.astype(object)
+        text[exact] = [_format_exact(v, decimals) for v in x[exact]]
+    text = np.where(np.signbit(x) & finite, np.char.add("-", text), text)
+    if not finite.all():
+        text = np.where(finite, text, np.where(np.isnan(x), "nan", np.where(x > 0, "inf", "-inf")))
+    if prefix:
+        text = np.char.add(prefix, text)
+    if suffix:
+        text = np.char.add(text, suffix)
+    return text.astype(object)
+
+
+def format_eur(values, decimals=0) -> np.ndarray:
+    return format_number_eu(values, decimals, prefix="€")
+
+
+def format_eur2(values) -> np.ndarray:
+    return format_number_eu(values, 2, prefix="€")
+
+
+def format_pct(values, decimals=1) -> np.ndarray:
+    return format_number_eu(values, decimals, suffix="%")
+
+
+def format_int(values) -> np.ndarray:
+    return format_number_eu(values, 0)
+
+
+def format_frame(df: pd.DataFrame, formatters: dict) -> pd.DataFrame:
+    """Kopie van `df` waarin de opgegeven kolommen vervangen zijn door hun EU-strings.
+
+    Voor weergave en CSV-exports; de waarden zijn daarna tekst, dus sorteer vóór het formatteren.
+    """
+    out = df.copy()
+    for column, formatter in formatters.items():
+        if column in out.columns:
+            out[column] = formatter(out[column])
+    return out
+
+
+# -----------------------------
+# Losse waarden (bijv. in st.markdown)
+# -----------------------------
+def fmt_eur(x):
+    return format_eur([x])[0]
+
+
+def fmt_eur2(x):
+    return format_eur2([x])[0]
+
+
+def fmt_pct(x):
+    return format_pct([x])[0]
+
+
+def fmt_int(x):
+    return format_int([x])[0]
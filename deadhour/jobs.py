@@ -0,0 +1,106 @@
+"""Ophalen buiten de script-thread: de pagina rendert wat er al is en verfijnt bij elke rerun.
+
+Een KPILoadJob draait load_kpi_data_many in een daemon-thread en werkt per binnengekomen
+deel (winkel × datumchunk) de gedeelde SlotCube bij. De pagina simuleert bij elke run uit
+die cube, dus het eerste resultaat staat er na ongeveer één round-trip:
+
+    job = KPILoadJob(shop_ids, start, end, 9, 19, KPI_OUTPUTS, client, store, cache, cube=cube).start()
+    ...
+    job.cancel()  # selectie gewijzigd: nog niet gestarte delen worden overgeslagen
+"""
+
+import threading
+import time
+
+from deadhour.metrics import StageMetrics
+from deadhour.pipeline import load_kpi_data_many
+
+
+class KPILoadJob:
+    """Eén achtergrond-fetch met voortgang, annuleren en tussentijdse cube-updates."""
+
+    def __init__(self, shop_ids, start_date, end_date, start_hour, end_hour, kpis, client, store, cache,
+                 cube=None, metrics=None, **load_kwargs):
+        self.shop_ids = list(shop_ids)
+        self.window = (start_date, end_date, start_hour, end_hour)
+        self.kpis = list(kpis)
+        self.cube = cube
+        self.metrics = metrics if metrics is not None else StageMetrics()
+        self.results = None  # {shop_id: (df, foutmeldingen)} zodra klaar
+        self.error = None
+        self.chunks_done = 0
+        self.chunks_total = 0
+        self.started_at = None
+        self.first_chunk_seconds = None
+        self._args = (client, store, cache)
+        self._load_kwargs = load_kwargs
+        self._cancel = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Besturing
+    # -----------------------------
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="deadhour-load", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def done(self) -> bool:
+        return self._thread is not None and not self._thread.is_alive()
+
+    def matches(self, shop_ids, start_date, end_date, start_hour, end_hour) -> bool:
+        """Dekt deze job de gevraagde selectie (zelfde winkels, venster binnen het opgehaalde)?"""
+        job_start, job_end, job_start_hour, job_end_hour = self.window
+        return (list(shop_ids) == self.shop_ids and job_start <= start_date and end_date <= job_end
+                and job_start_hour <= start_hour and end_hour <= job_end_hour)
+
+    # -----------------------------
+    # Achtergrond-thread
+    # -----------------------------
+    def _progress(self, done, total):
+        with self._lock:
+            self.chunks_done, self.chunks_total = done, total
+
+    def _on_chunk(self, fetch_range, frames):
+        if self.first_chunk_seconds is None:
+            self.first_chunk_seconds = time.perf_counter() - self.started_at
+        if self.cube is not None:
+            for df in frames.values():
+                self.cube.update(df)
+
+    def _run(self):
+        client, store, cache = self._args
+        try:
+            with self.metrics.stage("load") as record:
+                results = load_kpi_data_many(
+                    self.shop_ids, *self.window, self.kpis, client, store, cache, metrics=self.metrics,
+                    progress=self._progress, cancel=self._cancel, on_chunk=self._on_chunk, **self._load_kwargs,
+                )
+                record["rows"] = sum(len(df) for df, _ in results.values())
+            # Ook data uit cache en store (niet per deel binnengekomen) in de cube zetten
+            if self.cube is not None:
+                with self.metrics.stage("aggregate", rows=record["rows"]):
+                    for df, _ in results.values():
+                        self.cube.update(df)
+            self.results = results
+        except Exception as e:
+            self.error = e
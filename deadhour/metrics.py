@@ -0,0 +1,126 @@
+"""Instrumentatie per stage: wall time, rijen, payload-bytes en cache hit/miss.
+
+Elke analyse krijgt een eigen StageMetrics; afgeronde stages gaan als JSON-regel naar de
+logger "deadhour.metrics" en tellen mee in het proces-brede REGISTRY, dat als
+Prometheus-tekstformaat geëxporteerd kan worden:
+
+    metrics = StageMetrics()
+    with metrics.stage("normalize") as record:
+        df = normalize_vemcount_response(raw)
+        record["rows"] = len(df)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LOGGER = logging.getLogger("deadhour.metrics")
+
+COUNTER_FIELDS = {
+    "rows": "deadhour_stage_rows_total",
+    "bytes": "deadhour_payload_bytes_total",
+    "cache_hits": "deadhour_cache_hits_total",
+    "cache_misses": "deadhour_cache_misses_total",
+}
+
+
+class MetricsRegistry:
+    """Proces-brede totalen per stage (thread-safe), voor export naar Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, record):
+        with self._lock:
+            totals = self._stages.setdefault(record["stage"], {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            totals["count"] += 1
+            totals["seconds"] += record.get("seconds", 0.0)
+            totals["max_seconds"] = max(totals["max_seconds"], record.get("seconds", 0.0))
+            for field in COUNTER_FIELDS:
+                if record.get(field) is not None:
+                    totals[field] = totals.get(field, 0) + record[field]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {stage: dict(totals) for stage, totals in self._stages.items()}
+
+    def prometheus_text(self) -> str:
+        stages = self.snapshot()
+        lines = [
+            "# HELP deadhour_stage_seconds_total Totale wall time per stage.",
+            "# TYPE deadhour_stage_seconds_total counter",
+            *(f'deadhour_stage_seconds_total{{stage="{s}"}} {t["seconds"]:.6f}' for s, t in stages.items()),
+            "# HELP deadhour_stage_calls_total Aantal keer dat een stage gedraaid heeft.",
+            "# TYPE deadhour_stage_calls_total counter",
+            *(f'deadhour_stage_calls_total{{stage="{s}"}} {t["count"]}' for s, t in stages.items()),
+            "# HELP deadhour_stage_max_seconds Langste enkele run per stage sinds start.",
+            "# TYPE deadhour_stage_max_seconds gauge",
+            *(f'deadhour_stage_max_seconds{{stage="{s}"}} {t["max_seconds"]:.6f}' for s, t in stages.items()),
+        ]
+        for field, name in COUNTER_FIELDS.items():
+            samples = [f'{name}{{stage="{s}"}} {t[field]}' for s, t in stages.items() if field in t]
+            if samples:
+                lines += [f"# TYPE {name} counter", *samples]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Schrijf atomisch een .prom-bestand, bijv. voor de textfile-collector van node_exporter."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(f"{path}.tmp", "w") as fh:
+            fh.write(self.prometheus_text())
+        os.replace(f"{path}.tmp", path)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+class StageMetrics:
+    """Verzamelt de stages van één analyse; veilig te gebruiken vanuit worker-threads."""
+
+    def __init__(self, registry=REGISTRY, logger=LOGGER, **labels):
+        self.records = []
+        self.labels = labels
+        self._registry = registry
+        self._logger = logger
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        record = {"stage": name, **fields}
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - started
+            self._finish(record)
+
+    def add(self, name, seconds=0.0, **fields):
+        self._finish({"stage": name, **fields, "seconds": seconds})
+
+    def _finish(self, record):
+        with self._lock:
+            self.records.append(record)
+        if self._registry is not None:
+            self._registry.observe(record)
+        if self._logger is not None and self._logger.isEnabledFor(logging.INFO):
+            self._logger.info(json.dumps({**self.labels, **record}, default=str))
+
+    def total_seconds(self, name) -> float:
+        return sum(r["seconds"] for r in self.records if r["stage"] == name)
+
+    def to_frame(self):
+        import pandas as pd
+
+        columns = ["stage", "seconds", "rows", "bytes", "cache_hits", "cache_misses"]
+        df = pd.DataFrame(self.records)
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        return df[[c for c in columns if c in df.columns] + [c for c in df.columns if c not in columns]]
@@ -0,0 +1,142 @@
+"""Fetch-pijplijn zonder Streamlit: cache → lokale store → (gebatchte, gechunkte, parallelle) API-calls."""
+
+import time
+
+from deadhour.metrics import StageMetrics
+from fetch_planner import split_range
+from kpi_cache import make_cache_key, ttl_for_range
+from vemcount_client import VemcountAPIError, chunked, fetch_many
+
+KPI_OUTPUTS = ["count_in", "conversion_rate", "turnover", "sales_per_visitor", "sales_per_transaction"]
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_CHUNK_DAYS = 31
+DEFAULT_CHUNK_RETRIES = 2
+CHUNK_RETRY_BACKOFF = 1.0  # seconden, verdubbelt per poging
+
+
+class FetchCancelled(Exception):
+    """Een deel is overgeslagen omdat de aanroeper de fetch geannuleerd heeft."""
+
+
+def describe_fetch_error(error):
+    if isinstance(error, FetchCancelled):
+        return "⏹️ Ophalen geannuleerd"
+    if isinstance(error, VemcountAPIError):
+        return f"❌ Error fetching data: {error.status_code}"
+    return f"🚨 API call exception: {error}"
+
+
+def is_transient(error) -> bool:
+    # 4xx (behalve 429) komt bij een nieuwe poging net zo terug; time-outs, verbroken verbindingen en 5xx niet per se.
+    # Wat de client zelf al met backoff opnieuw probeerde niet nóg eens: de twee lagen zouden vermenigvuldigen.
+    if isinstance(error, FetchCancelled) or getattr(error, "retried", False):
+        return False
+    return not isinstance(error, VemcountAPIError) or error.status_code == 429 or error.status_code >= 500
+
+
+def with_retries(fn, retries=DEFAULT_CHUNK_RETRIES, backoff=CHUNK_RETRY_BACKOFF):
+    """Roep `fn()` aan en probeer bij een tijdelijke fout tot `retries` keer opnieuw, met exponentiële backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+
+def load_kpi_data_many(shop_ids, start_date, end_date, start_hour, end_hour, kpis, client, store, cache,
+                       batch_size=DEFAULT_BATCH_SIZE, max_workers=DEFAULT_MAX_WORKERS, metrics=None, flights=None,
+                       chunk_days=DEFAULT_CHUNK_DAYS, retries=DEFAULT_CHUNK_RETRIES, progress=None, cancel=None,
+                       on_chunk=None) -> dict:
+    """Haal KPI-data op via cache → lokale store → API. Bevat geen st-calls, zodat het
+    ook vanuit worker-threads kan draaien; geeft {shop_id: (df, foutmeldingen)} terug.
+
+    Elke stage (cache, fetch/parse/normalize, store) wordt vastgelegd in `metrics`. Met een
+    gedeelde `flights` (SingleFlight) wachten gelijktijdige identieke batches uit andere
+    sessies op één API-call plus store-merge in plaats van zelf te fetchen.
+
+    Lange bereiken worden in delen van `chunk_days` dagen parallel opgehaald. Elk deel gaat
+    direct de store in, die zo als checkpoint dient: een mislukt deel wordt los opnieuw
+    geprobeerd (`retries`, alleen voor fouten die de client niet zelf al opnieuw probeerde), en een afgebroken of deels mislukte run haalt bij de volgende
+    aanroep alleen de nog ontbrekende delen op. `progress(klaar, totaal)` volgt de delen.
+
+    Voor progressieve weergave: `on_chunk(bereik, {shop_id: df})` wordt per binnengekomen deel
+    aangeroepen (vanuit een worker-thread, nieuwste delen eerst), en met een gezet `cancel`-Event
+    worden nog niet gestarte delen overgeslagen.
+    """
+    metrics = metrics if metrics is not None else StageMetrics()
+    results, pending = {}, []
+    with metrics.stage("cache_lookup") as record:
+        for shop_id in shop_ids:
+            cached = cache.get(make_cache_key(shop_id, start_date, end_date, start_hour, end_hour, kpis))
+            if cached is not None:
+                results[shop_id] = (cached, [])
+            else:
+                pending.append(shop_id)
+        record.update(cache_hits=len(results), cache_misses=len(pending), rows=sum(len(df) for df, _ in results.values()))
+
+    # Alleen ontbrekende (datum, uur)-cellen ophalen, in delen van hoogstens `chunk_days`;
+    # winkels met hetzelfde ontbrekende deel delen één request per batch van `batch_size` winkels
+    jobs = {}
+    for shop_id in pending:
+        for fetch_range in store.missing_ranges(shop_id, kpis, start_date, end_date, start_hour, end_hour):
+            for chunk in split_range(fetch_range, chunk_days):
+                jobs.setdefault(chunk, []).append(shop_id)
+    batches = [(fetch_range, tuple(batch)) for fetch_range, ids in jobs.items() for batch in chunked(ids, batch_size)]
+    batches.sort(key=lambda job: job[0][0], reverse=True)  # recente weken eerst in beeld
+
+    def fetch_and_merge(fetch_range, batch):
+        result = client.fetch_kpis_batch(batch, *fetch_range, kpis, metrics=metrics)
+        with metrics.stage("store_merge") as record:
+            for shop_id in batch:
+                store.merge(shop_id, kpis, result[int(shop_id)], *fetch_range)
+            record["rows"] = sum(len(result[int(shop_id)]) for shop_id in batch)
+        return result
+
+    def run(job):
+        fetch_range, batch = job
+        if cancel is not None and cancel.is_set():
+            raise FetchCancelled()
+
+        def fetch():
+            return with_retries(lambda: fetch_and_merge(fetch_range, batch), retries)
+
+        result = fetch() if flights is None else flights.do(("fetch", fetch_range, batch, tuple(kpis)), fetch)
+        if on_chunk is not None:
+            on_chunk(fetch_range, result)
+        return result
+
+    done = 0
+
+    def on_result(job, result):
+        nonlocal done
+        done += 1
+        if progress is not None:
+            progress(done, len(batches))
+
+    fetched = fetch_many(run, batches, max_workers=max_workers, on_result=on_result)
+    errors = {shop_id: [] for shop_id in pending}
+    for fetch_range, batch in batches:
+        result = fetched[(fetch_range, batch)]
+        if isinstance(result, Exception):
+            message = describe_fetch_error(result)
+            if len(jobs) > 1 and not isinstance(result, FetchCancelled):
+                message += f" ({fetch_range[0]:%d-%m-%Y} t/m {fetch_range[1]:%d-%m-%Y})"
+            for shop_id in batch:
+                if message not in errors[shop_id]:
+                    errors[shop_id].append(message)
+
+    for shop_id in pending:
+        with metrics.stage("store_read") as record:
+            df = store.read(shop_id, kpis, start_date, end_date, start_hour, end_hour)
+            record["rows"] = len(df)
+        if not df.empty and not errors[shop_id]:
+            cache.put(make_cache_key(shop_id, start_date, end_date, start_hour, end_hour, kpis), df, ttl=ttl_for_range(end_date))
+        results[shop_id] = (df, errors[shop_id])
+    return results
+
+
+def load_kpi_data(shop_id, start_date, end_date, start_hour, end_hour, kpis, client, store, cache, **kwargs):
+    return load_kpi_data_many([shop_id], start_date, end_date, start_hour, end_hour, kpis, client, store, cache, **kwargs)[shop_id]
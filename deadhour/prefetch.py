@@ -0,0 +1,200 @@
+"""Achtergrond-warm-up: haal afgesloten uren van alle winkels alvast op in de lokale store.
+
+Draait als daemon-thread in het Streamlit-proces (PREFETCH_ENABLED) of als losse worker
+tegen een gedeeld Parquet-warehouse:
+
+    python -m deadhour prefetch --store-dir /data/kpi --days 90 --interval 60
+"""
+
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from deadhour.cli import parse_hours, resolve_api_url
+from deadhour.metrics import StageMetrics
+from deadhour.pipeline import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_DAYS, KPI_OUTPUTS, describe_fetch_error
+from fetch_planner import split_range
+from shop_mapping import SHOP_NAME_MAP
+from vemcount_client import chunked
+
+DEFAULT_DAYS = 90
+DEFAULT_HOURS = (0, 24)
+DEFAULT_INTERVAL = 3600.0
+DEFAULT_RATE = 1.0  # requests per seconde
+
+
+class RateLimiter:
+    """Token bucket: gemiddeld `rate` acquires per seconde, met pieken tot `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_event=None) -> bool:
+        """Wacht op een token; False als `stop_event` intussen gezet wordt."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop_event is None:
+                time.sleep(wait)
+            elif stop_event.wait(wait):
+                return False
+
+
+class Prefetcher:
+    """Vult periodiek de store met de afgesloten dagen [vandaag - days, gisteren] voor alle winkels.
+
+    Alleen ontbrekende (datum, uur)-cellen worden opgehaald: de eerste run vult het venster,
+    daarna worden per run alleen de dagen opgehaald die nog niet als compleet gelden
+    (gisteren, en dagen zonder data uit de laatste week; zie complete_days).
+    """
+
+    def __init__(self, client, store, shop_ids=None, kpis=KPI_OUTPUTS, days=DEFAULT_DAYS, hours=DEFAULT_HOURS,
+                 interval=DEFAULT_INTERVAL, rate=DEFAULT_RATE, batch_size=DEFAULT_BATCH_SIZE, chunk_days=DEFAULT_CHUNK_DAYS):
+        self.client = client
+        self.store = store
+        self.shop_ids = list(shop_ids if shop_ids is not None else SHOP_NAME_MAP)
+        self.kpis = list(kpis)
+        self.days = days
+        self.hours = hours
+        self.interval = interval
+        self.batch_size = batch_size
+        self.chunk_days = chunk_days
+        self.limiter = RateLimiter(rate)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._status = {
+            "state": "idle", "last_started": None, "last_finished": None, "next_run": None,
+            "shops_done": 0, "shops_total": len(self.shop_ids), "requests": 0, "errors": {},
+        }
+
+    # -----------------------------
+    # Status
+    # -----------------------------
+    def status(self) -> dict:
+        with self._lock:
+            return {**self._status, "errors": dict(self._status["errors"])}
+
+    def _set(self, **fields):
+        with self._lock:
+            self._status.update(fields)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # -----------------------------
+    # Eén warm-up run
+    # -----------------------------
+    def plan(self, today=None):
+        """Groepeer winkels per ontbrekend bereik tot batches: [((van, tot, van_uur, tot_uur), (shop_ids...))]."""
+        today = today or date.today()
+        start_date, end_date = today - timedelta(days=self.days), today - timedelta(days=1)
+        jobs = {}
+        for shop_id in self.shop_ids:
+            for fetch_range in self.store.missing_ranges(shop_id, self.kpis, start_date, end_date, *self.hours):
+                for chunk in split_range(fetch_range, self.chunk_days):
+                    jobs.setdefault(chunk, []).append(shop_id)
+        return [(fetch_range, tuple(batch)) for fetch_range, ids in jobs.items() for batch in chunked(ids, self.batch_size)]
+
+    def run_once(self, today=None) -> dict:
+        """Haal alle ontbrekende cellen op; geeft {shop_id: foutmelding} terug voor mislukte batches."""
+        today = today or date.today()
+        batches = self.plan(today)
+        errors = {}
+        pending = {shop_id for _, batch in batches for shop_id in batch}
+        self._set(state="running", last_started=datetime.now(), shops_done=len(self.shop_ids) - len(pending),
+                  requests=0, errors={})
+        metrics = StageMetrics(job="prefetch")
+
+        for fetch_range, batch in batches:
+            if not self.limiter.acquire(self._stop):
+                break
+            try:
+                frames = self.client.fetch_kpis_batch(batch, *fetch_range, self.kpis, metrics=metrics)
+            except Exception as e:
+                errors.update({shop_id: describe_fetch_error(e) for shop_id in batch})
+            else:
+                with metrics.stage("store_merge") as record:
+                    for shop_id in batch:
+                        self.store.merge(shop_id, self.kpis, frames[int(shop_id)], *fetch_range, today=today)
+                    record["rows"] = sum(len(frames[int(shop_id)]) for shop_id in batch)
+            pending.difference_update(batch)
+            with self._lock:
+                self._status["requests"] += 1
+                self._status["shops_done"] = len(self.shop_ids) - len(pending)
+                self._status["errors"] = dict(errors)
+
+        self._set(state="error" if errors else "idle", last_finished=datetime.now())
+        return errors
+
+    # -----------------------------
+    # Achtergrond-thread
+    # -----------------------------
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                self._set(state="error", last_finished=datetime.now(), errors={"*": str(e)})
+            self._set(next_run=datetime.now() + timedelta(seconds=self.interval))
+            self._stop.wait(self.interval)
+        self._set(state="stopped", next_run=None)
+
+    def start(self):
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="deadhour-prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+# -----------------------------
+# CLI: python -m deadhour prefetch
+# -----------------------------
+def add_arguments(parser):
+    parser.add_argument("--store-dir", required=True, help="Map van het Parquet KPI-warehouse (zelfde als KPI_STORE_DIR van de app).")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help=f"Aantal afgesloten dagen om warm te houden (standaard {DEFAULT_DAYS}).")
+    parser.add_argument("--hours", type=parse_hours, default=DEFAULT_HOURS, help="Uurvenster als van-tot (standaard 0-24).")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL / 60, help="Minuten tussen runs (standaard 60).")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Maximaal aantal API-requests per seconde (standaard 1).")
+    parser.add_argument("--once", action="store_true", help="Eén run en dan stoppen (bijv. vanuit cron).")
+    parser.add_argument("--api-url", default=None)
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    from kpi_warehouse import ParquetKPIStore
+    from vemcount_client import VemcountClient
+
+    prefetcher = Prefetcher(
+        VemcountClient(resolve_api_url(args.api_url), pool_size=1), ParquetKPIStore(args.store_dir),
+        days=args.days, hours=args.hours, interval=args.interval * 60, rate=args.rate,
+    )
+    while True:
+        started = time.perf_counter()
+        errors = prefetcher.run_once()
+        status = prefetcher.status()
+        for shop_id, message in sorted(errors.items()):
+            print(f"{SHOP_NAME_MAP.get(shop_id, shop_id)} ({shop_id}): {message}", file=sys.stderr)
+        print(f"{status['requests']} requests, {status['shops_total'] - len(errors)}/{status['shops_total']} winkels warm "
+              f"({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+        if args.once:
+            return 1 if errors else 0
+        time.sleep(prefetcher.interval)
@@ -0,0 +1,408 @@
+"""Offline werken zonder de live API: responses opnemen als fixtures en lokaal terugspelen.
+
+Opnemen gebeurt rond de client: een RecordingClient bewaart elke geslaagde response
+gzip-gecomprimeerd in een fixture-map, zodat de app (met API_RECORD_DIR) of de CLI
+gewoon tegen de echte API draait en ondertussen een dataset opbouwt:
+
+    python -m deadhour record --fixtures fixtures/ --days 90
+
+Terugspelen gebeurt via een lokale HTTP-server die zich als de Vemcount API gedraagt,
+inclusief instelbare latency, foutinjectie en een concurrency-limiet. De hele pagina
+(connection pool, retries, chunking, background jobs) loopt zo offline en reproduceerbaar:
+
+    python -m deadhour replay --fixtures fixtures/ --port 8765 --latency 0.3 --error-rate 0.05
+
+Een query die exact zo is opgenomen krijgt de opgeslagen bytes terug; elke andere query
+wordt samengesteld uit de opgenomen (winkel, datum, uur)-cellen die erin vallen.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+from deadhour.cli import parse_hours, resolve_api_url
+from vemcount_client import VemcountClient, build_query_params
+
+FIXTURE_SUFFIX = ".json.gz"
+DEFAULT_ERROR_STATUS = 503
+
+
+def query_key(params) -> str:
+    """(naam, waarde)-paren van een query → sleutel, onafhankelijk van volgorde en int/str-waarden."""
+    pairs = sorted((str(name), str(value)) for name, value in params)
+    return hashlib.blake2b(repr(pairs).encode("utf-8"), digest_size=16).hexdigest()
+
+
+# -----------------------------
+# Fixtures
+# -----------------------------
+class FixtureStore:
+    """Eén gzip-bestand per opgenomen response, met de querysleutel als naam."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + FIXTURE_SUFFIX)
+
+    def save(self, params, body: bytes):
+        path = self._path(query_key(params))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(gzip.compress(body, compresslevel=6))
+        os.replace(tmp_path, path)
+
+    def load_compressed(self, key):
+        """Opgeslagen gzip-bytes voor een querysleutel, of None."""
+        try:
+            with open(self._path(key), "rb") as fh:
+                return fh.read()
+        except OSError:
+            return None
+
+    def keys(self):
+        return sorted(name[:-len(FIXTURE_SUFFIX)] for name in os.listdir(self.directory) if name.endswith(FIXTURE_SUFFIX))
+
+    def payloads(self):
+        for key in self.keys():
+            compressed = self.load_compressed(key)
+            if compressed is not None:
+                yield json.loads(gzip.decompress(compressed))
+
+
+class RecordingClient(VemcountClient):
+    """VemcountClient die elke geslaagde response ook als fixture bewaart.
+
+    Opnemen leest de body toch volledig in; streaming staat daarom altijd uit."""
+
+    def __init__(self, api_url, fixtures, **kwargs):
+        kwargs["streaming"] = False
+        super().__init__(api_url, **kwargs)
+        self.fixtures = fixtures if isinstance(fixtures, FixtureStore) else FixtureStore(fixtures)
+        self.recorded = 0
+
+    def _post(self, shop_ids, start_date, end_date, start_hour, end_hour, kpis, stream=False):
+        response = super()._post(shop_ids, start_date, end_date, start_hour, end_hour, kpis, stream=False)
+        params = build_query_params(shop_ids, start_date, end_date, start_hour, end_hour, kpis)
+        self.fixtures.save(params, response.content)
+        self.recorded += 1
+        return response
+
+
+# -----------------------------
+# Samenstellen uit opgenomen cellen
+# -----------------------------
+class FixtureIndex:
+    """Alle opgenomen uurcellen per winkel en datum, om willekeurige queries te beantwoorden.
+
+    Met `shift_days` schuift de hele dataset in de tijd: een query voor datum d krijgt de
+    cellen van d - shift_days, met verschoven tijdstempels (bijv. om opnames van vorige
+    maand als 'laatste 30 dagen' te blijven gebruiken)."""
+
+    def __init__(self, fixtures: FixtureStore, shift_days=0):
+        self.fixtures = fixtures
+        self.shift = timedelta(days=shift_days)
+        self._shops = {}  # shop_id -> (metadata, {datum: {uur: (dt, data)}})
+        self.first_date = None
+        self.last_date = None
+        for payload in fixtures.payloads():
+            self._add(payload)
+
+    def _add(self, payload):
+        for period in payload.get("data", {}).values():
+            for shop_key, shop_info in period.items():
+                meta = shop_info.get("data", {})
+                shop_id = str(meta.get("id", shop_key))
+                _, days = self._shops.setdefault(shop_id, (meta, {}))
+                for ts_info in shop_info.get("dates", {}).values():
+                    row = ts_info.get("data", {})
+                    dt = row.get("dt")
+                    if not dt:
+                        continue
+                    day = date.fromisoformat(dt[:10])
+                    # Latere opnames vullen aan: KPI's uit verschillende queries worden samengevoegd
+                    cell = days.setdefault(day, {}).setdefault(int(dt[11:13]), (dt, {}))
+                    cell[1].update(row)
+                    self.first_date = day if self.first_date is None else min(self.first_date, day)
+                    self.last_date = day if self.last_date is None else max(self.last_date, day)
+
+    @property
+    def shops(self):
+        return len(self._shops)
+
+    def covers(self, shop_id, day) -> bool:
+        days = self._shops.get(str(shop_id), (None, {}))[1]
+        return (day - self.shift) in days
+
+    def compose(self, query) -> dict:
+        """Vemcount-achtige payload voor een geparste query ({naam: [waarden]})."""
+        start_date = date.fromisoformat(query["form_date_from"][0])
+        end_date = date.fromisoformat(query["form_date_to"][0])
+        start_hour = int(query.get("show_hours_from", ["00:00"])[0][:2])
+        end_hour = int(query.get("show_hours_to", ["24:00"])[0][:2])
+        kpis = query.get("data_output") or None
+
+        shops = {}
+        for shop_id in query.get("data", []):
+            if shop_id not in self._shops:
+                continue
+            meta, days = self._shops[shop_id]
+            dates = {}
+            day = start_date
+            while day <= end_date:
+                for hour, (dt, row) in sorted(days.get(day - self.shift, {}).items()):
+                    if not start_hour <= hour < end_hour:
+                        continue
+                    if self.shift:
+                        dt = f"{day.isoformat()}{dt[10:]}"
+                    values = {kpi: row[kpi] for kpi in kpis if kpi in row} if kpis else {k: v for k, v in row.items() if k != "dt"}
+                    dates[dt] = {"data": {"dt": dt, **values}}
+                day += timedelta(days=1)
+            if dates:
+                shops[shop_id] = {"data": meta, "dates": dates}
+        return {"data": {start_date.isoformat(): shops}}
+
+
+# -----------------------------
+# Lokale API stand-in
+# -----------------------------
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server.replay
+        with server.admit() as status:
+            if status is None:
+                status, body, encoding = server.respond(urlparse(self.path).query, "gzip" in self.headers.get("Accept-Encoding", ""))
+            else:
+                body, encoding = json.dumps({"error": status}).encode("utf-8"), None
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+class _Admission:
+    def __init__(self, server):
+        self.server = server
+        self.admitted = False
+
+    def __enter__(self):
+        server = self.server
+        with server._lock:
+            server.requests += 1
+            if server.max_concurrent and server._active >= server.max_concurrent:
+                server.rejected += 1
+                return 429
+            server._active += 1
+            server.peak_concurrent = max(server.peak_concurrent, server._active)
+            self.admitted = True
+            failed = server._rng.random() < server.error_rate
+            delay = server.latency + server._rng.uniform(0, server.jitter) if server.jitter else server.latency
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            with server._lock:
+                server.errors += 1
+            return server.error_status
+        return None
+
+    def __exit__(self, *exc):
+        if self.admitted:
+            with self.server._lock:
+                self.server._active -= 1
+
+
+class ReplayServer:
+    """Lokale Vemcount API op basis van opgenomen fixtures.
+
+    - `latency` + uniform `jitter` seconden per request (vóór het antwoord, ook bij fouten);
+    - `error_rate`: fractie requests die `error_status` teruggeeft (reproduceerbaar via `seed`);
+    - `max_concurrent`: meer gelijktijdige requests krijgen 429 met Retry-After, zoals een
+      rate-limitende API;
+    - `strict`: een query met (winkel, datum)-combinaties zonder opname geeft 404 in plaats
+      van een (deels) lege dataset, om gaten in de fixtures te vinden.
+    """
+
+    def __init__(self, fixtures, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=DEFAULT_ERROR_STATUS, max_concurrent=0, strict=False, shift_days=0, seed=None):
+        self.fixtures = fixtures if isinstance(fixtures, FixtureStore) else FixtureStore(fixtures)
+        self.index = FixtureIndex(self.fixtures, shift_days=shift_days)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_concurrent = max_concurrent
+        self.strict = strict
+        self.requests = 0
+        self.exact_hits = 0
+        self.composed = 0
+        self.misses = 0
+        self.errors = 0
+        self.rejected = 0
+        self.peak_concurrent = 0
+        self._active = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self._server.daemon_threads = True
+        self._server.replay = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def admit(self):
+        return _Admission(self)
+
+    def respond(self, query_string, accept_gzip):
+        """Geeft (status, body, content-encoding) voor een querystring."""
+        params = parse_qsl(query_string)
+        if not self.index.shift:
+            compressed = self.fixtures.load_compressed(query_key(params))
+            if compressed is not None:
+                with self._lock:
+                    self.exact_hits += 1
+                return (200, compressed, "gzip") if accept_gzip else (200, gzip.decompress(compressed), None)
+
+        query = {}
+        for name, value in params:
+            query.setdefault(name, []).append(value)
+        if self.strict and not self._covered(query):
+            with self._lock:
+                self.misses += 1
+            return 404, json.dumps({"error": "niet opgenomen"}).encode("utf-8"), None
+
+        with self._lock:
+            self.composed += 1
+        body = json.dumps(self.index.compose(query)).encode("utf-8")
+        return (200, gzip.compress(body, compresslevel=1), "gzip") if accept_gzip else (200, body, None)
+
+    def _covered(self, query):
+        start_date = date.fromisoformat(query["form_date_from"][0])
+        end_date = date.fromisoformat(query["form_date_to"][0])
+        days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        return all(self.index.covers(shop_id, day) for shop_id in query.get("data", []) for day in days)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests, "exact_hits": self.exact_hits, "composed": self.composed,
+                "misses": self.misses, "errors": self.errors, "rejected": self.rejected,
+                "peak_concurrent": self.peak_concurrent,
+            }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="deadhour-replay", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def shift_to(index: FixtureIndex, last_day) -> int:
+    """Aantal dagen waarmee de opnames verschoven moeten worden zodat de laatste opgenomen dag `last_day` wordt."""
+    return 0 if index.last_date is None else (last_day - index.last_date).days
+
+
+# -----------------------------
+# CLI: python -m deadhour record / replay
+# -----------------------------
+def add_record_arguments(parser):
+    parser.add_argument("--fixtures", required=True, help="Map waarin de gecomprimeerde responses komen.")
+    parser.add_argument("--days", type=int, default=90, help="Aantal dagen terug vanaf gisteren (standaard 90).")
+    parser.add_argument("--hours", type=parse_hours, default=(0, 24), help="Uurvenster als van-tot (standaard 0-24).")
+    parser.add_argument("--chunk-days", type=int, default=None, help="Maximaal aantal dagen per request.")
+    parser.add_argument("--batch-size", type=int, default=None, help="Winkels per request.")
+    parser.add_argument("--shops", default=None, help="Komma-gescheiden shop-id's (standaard alle winkels).")
+    parser.add_argument("--api-url", default=None)
+    parser.set_defaults(func=record_main)
+
+
+def record_main(args):
+    from deadhour.pipeline import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_DAYS, KPI_OUTPUTS
+    from fetch_planner import split_range
+    from shop_mapping import SHOP_NAME_MAP
+    from vemcount_client import chunked
+
+    client = RecordingClient(resolve_api_url(args.api_url), args.fixtures, pool_size=1)
+    shop_ids = [int(s) for s in args.shops.split(",")] if args.shops else list(SHOP_NAME_MAP)
+    end_date = date.today() - timedelta(days=1)
+    fetch_range = (end_date - timedelta(days=args.days - 1), end_date, *args.hours)
+    failures = 0
+    for chunk in split_range(fetch_range, args.chunk_days or DEFAULT_CHUNK_DAYS):
+        for batch in chunked(shop_ids, args.batch_size or DEFAULT_BATCH_SIZE):
+            try:
+                client.fetch_kpis_batch(batch, *chunk, KPI_OUTPUTS)
+            except Exception as e:
+                failures += 1
+                print(f"{chunk[0]}–{chunk[1]} {batch}: {e}", file=sys.stderr)
+    print(f"{client.recorded} responses opgenomen in {args.fixtures} ({failures} mislukt)", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def add_replay_arguments(parser):
+    parser.add_argument("--fixtures", required=True, help="Map met opgenomen responses.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Vaste vertraging per request in seconden.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra willekeurige vertraging (0..jitter seconden).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fractie requests die een fout teruggeeft.")
+    parser.add_argument("--error-status", type=int, default=DEFAULT_ERROR_STATUS)
+    parser.add_argument("--max-concurrent", type=int, default=0, help="Meer gelijktijdige requests krijgen 429 (0 = onbeperkt).")
+    parser.add_argument("--strict", action="store_true", help="404 voor queries die niet volledig opgenomen zijn.")
+    parser.add_argument("--shift-to-today", action="store_true", help="Verschuif de opnames zodat de laatste dag gisteren is.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed voor reproduceerbare foutinjectie en jitter.")
+    parser.set_defaults(func=replay_main)
+
+
+def replay_main(args):
+    server = ReplayServer(
+        args.fixtures, host=args.host, port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        error_status=args.error_status, max_concurrent=args.max_concurrent, strict=args.strict, seed=args.seed,
+    )
+    index, fixtures = server.index, server.fixtures
+    shift_days = shift_to(index, date.today() - timedelta(days=1)) if args.shift_to_today else 0
+    index.shift = timedelta(days=shift_days)
+    print(f"{len(fixtures.keys())} fixtures, {index.shops} winkels, {index.first_date} t/m {index.last_date}"
+          f"{f' (verschoven {shift_days:+d} dagen)' if shift_days else ''}", file=sys.stderr)
+    print(f"Zet API_URL = \"{server.url}\" in .streamlit/secrets.toml (Ctrl+C om te stoppen)", file=sys.stderr)
+    server.start()
+    try:
+        while True:
+            time.sleep(60)
+            print(server.stats(), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
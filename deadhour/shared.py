@@ -0,0 +1,295 @@
+"""Proces-brede resultaatlaag: identieke calls uit verschillende sessies delen één berekening.
+
+Twee onderdelen:
+
+- SingleFlight: gelijktijdige calls met dezelfde sleutel wachten op één Future in plaats
+  van elk zelf de API aan te roepen of te simuleren.
+- ResultCache: bewaart afgeronde resultaten (bijv. dead-hour simulaties) voor alle sessies,
+  in geheugen, op disk of in een Redis-compatibele server (Redis, Valkey, KeyDB, ...):
+
+    cache = ResultCache(backend_from_url("redis://localhost:6379/0"))
+    results = cache.get_or_compute(("simulate", shop_ids, ...), lambda: cube.simulate(...))
+
+Disk en Redis zijn gedeelde opslag: daar staan entries als Parquet (DataFrames) of JSON,
+nooit als pickle, zodat wie daar kan schrijven geen code kan laten uitvoeren bij het lezen.
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 6 * 3600
+KEY_PREFIX = "deadhour:result:"
+
+
+def frame_digest(*frames, **params) -> str:
+    """Stabiele hash van DataFrames plus parameters, als cache-sleutel voor afgeleide resultaten."""
+    digest = hashlib.blake2b(digest_size=16)
+    for df in frames:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        digest.update(",".join(map(str, df.columns)).encode())
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()
+
+
+def key_digest(key) -> str:
+    """Sleutel (tuple van ids, datums, parameters) → korte string, gelijk over processen heen."""
+    return hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+
+
+# -----------------------------
+# Request coalescing
+# -----------------------------
+class SingleFlight:
+    """Eén lopende call per sleutel; wie tegelijk dezelfde sleutel vraagt, wacht op diens Future."""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+# -----------------------------
+# Serialisatie voor gedeelde opslag
+# -----------------------------
+FORMAT_VERSION = 1
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Een gedeelde result-cache (disk of Redis) vereist het pakket 'pyarrow' (pip install pyarrow).") from e
+
+
+def encode_value(value, expires_at=None) -> bytes:
+    """Eén regel JSON-header (formaat, soort, verloopmoment) en daarna Parquet- of JSON-bytes."""
+    if isinstance(value, pd.DataFrame):
+        buffer = io.BytesIO()
+        value.to_parquet(buffer)
+        kind, body = "frame", buffer.getvalue()
+    else:
+        try:
+            kind, body = "json", json.dumps(value).encode("utf-8")
+        except TypeError as e:
+            raise TypeError(f"Gedeelde result-cache slaat alleen DataFrames en JSON-waarden op, geen {type(value).__name__}.") from e
+    header = json.dumps({"v": FORMAT_VERSION, "kind": kind, "expires_at": expires_at}).encode("utf-8")
+    return header + b"\n" + body
+
+
+def decode_value(payload: bytes):
+    """Omgekeerde van encode_value: (waarde, expires_at). ValueError bij een onbekend of beschadigd formaat."""
+    header, _, body = payload.partition(b"\n")
+    meta = json.loads(header)
+    if not isinstance(meta, dict) or meta.get("v") != FORMAT_VERSION:
+        raise ValueError("Onbekend formaat in de result-cache.")
+    if meta.get("kind") == "frame":
+        value = pd.read_parquet(io.BytesIO(body))
+    elif meta.get("kind") == "json":
+        value = json.loads(body)
+    else:
+        raise ValueError(f"Onbekende soort {meta.get('kind')!r} in de result-cache.")
+    return value, meta.get("expires_at")
+
+
+# -----------------------------
+# Opslag
+# -----------------------------
+class MemoryBackend:
+    """LRU in het eigen proces, met TTL per entry."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskBackend:
+    """Bestanden in een gedeelde map (zie encode_value); meerdere server-processen op één host delen zo resultaten."""
+
+    SUFFIX = ".result"
+
+    def __init__(self, directory):
+        _require_pyarrow()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.SUFFIX}")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                value, expires_at = decode_value(fh.read())
+        except (OSError, ValueError):
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = None if ttl is None else time.time() + ttl
+        payload = encode_value(value, expires_at)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        # Ook .pkl-bestanden van vóór het Parquet/JSON-formaat; die worden nooit meer gelezen
+        for name in os.listdir(self.directory):
+            if name.endswith((self.SUFFIX, ".pkl")):
+                os.remove(os.path.join(self.directory, name))
+
+
+class RedisBackend:
+    """Elke server die het Redis-protocol spreekt; TTL via SET ... EX."""
+
+    def __init__(self, url, prefix=KEY_PREFIX):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("Een Redis result-cache vereist het pakket 'redis' (pip install redis).") from e
+        _require_pyarrow()
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        payload = self._client.get(self.prefix + key)
+        if payload is None:
+            return None
+        try:
+            value, _ = decode_value(payload)
+        except (OSError, ValueError):
+            return None  # beschadigd of een oud (pickle-)formaat: behandelen als miss
+        return value
+
+    def set(self, key, value, ttl=None):
+        payload = encode_value(value)
+        self._client.set(self.prefix + key, payload, ex=None if ttl is None else max(1, int(ttl)))
+
+    def clear(self):
+        for name in self._client.scan_iter(f"{self.prefix}*"):
+            self._client.delete(name)
+
+
+def backend_from_url(url=None, max_entries=DEFAULT_MAX_ENTRIES):
+    """None/"memory" → MemoryBackend, "redis://…"/"rediss://…" → RedisBackend, anders een map voor DiskBackend."""
+    if not url or url == "memory":
+        return MemoryBackend(max_entries)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return DiskBackend(url[len("file://"):] if url.startswith("file://") else url)
+
+
+# -----------------------------
+# Gedeelde resultaten
+# -----------------------------
+class ResultCache:
+    """Resultaten per sleutel, gedeeld tussen sessies; gelijktijdige misses rekenen één keer.
+
+    De sleutel moet alles bevatten waar het resultaat van afhangt (ook een digest van de
+    onderliggende data), want entries worden niet actief geïnvalideerd, alleen via de TTL.
+    DataFrames worden als kopie teruggegeven, zodat een sessie de gedeelde versie niet wijzigt.
+    """
+
+    def __init__(self, backend=None, ttl=DEFAULT_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, compute, ttl=None, metrics=None):
+        digest = key_digest(key)
+        value = self.backend.get(digest)
+        hit = value is not None
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+            value = self.flights.do(digest, lambda: self._compute(digest, compute, ttl))
+        if metrics is not None:
+            metrics.add("result_cache", cache_hits=int(hit), cache_misses=int(not hit))
+        return value.copy() if isinstance(value, pd.DataFrame) else value
+
+    def _compute(self, digest, compute, ttl):
+        # Een ander proces kan hem intussen al berekend hebben
+        value = self.backend.get(digest)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.backend.set(digest, value, self.ttl if ttl is None else ttl)
+        return value
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.flights.coalesced,
+                "in_flight": self.flights.in_flight()}
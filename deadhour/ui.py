@@ -0,0 +1,299 @@
+"""Streamlit-laag rond de pijplijn: gedeelde resources per server-proces en foutmeldingen.
+
+Alle pagina's importeren hieruit, zodat er één implementatie van het ophalen bestaat.
+Instellingen komen uit st.secrets en worden pas gelezen als een resource nodig is.
+"""
+
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from deadhour.metrics import REGISTRY
+from deadhour.pipeline import (
+    DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_DAYS, DEFAULT_CHUNK_RETRIES, DEFAULT_MAX_WORKERS, KPI_OUTPUTS, describe_fetch_error,
+    load_kpi_data_many,
+)
+from fetch_planner import HourlyKPIStore
+from kpi_cache import KPICache
+from shop_mapping import SHOP_NAME_MAP
+from slot_cube import SlotCube
+from vemcount_client import VemcountClient
+
+
+def secret(name, default=None):
+    return st.secrets.get(name, default)
+
+
+def secret_flag(name, default=False):
+    return str(secret(name, default)).lower() in ("1", "true", "yes")
+
+
+@st.cache_resource
+def get_kpi_cache() -> KPICache:
+    # Eén cache per server-proces, gedeeld door alle sessies
+    max_mb = int(secret("KPI_CACHE_MAX_MB", 256))
+    return KPICache(max_bytes=max_mb * 1024 * 1024, disk_dir=secret("KPI_CACHE_DIR"))
+
+
+@st.cache_resource
+def get_kpi_store():
+    # Met KPI_STORE_DIR een Parquet-warehouse op disk (overleeft herstarts), anders alleen in geheugen
+    store_dir = secret("KPI_STORE_DIR")
+    if store_dir:
+        from kpi_warehouse import ParquetKPIStore
+        return ParquetKPIStore(store_dir)
+    max_mb = int(secret("KPI_STORE_MAX_MB", 512))
+    return HourlyKPIStore(max_bytes=max_mb * 1024 * 1024)
+
+
+@st.cache_resource
+def get_slot_cube() -> SlotCube:
+    max_mb = int(secret("SLOT_CUBE_MAX_MB", 256))
+    return SlotCube(max_bytes=max_mb * 1024 * 1024)
+
+
+@st.cache_resource
+def get_result_cache():
+    # Eén resultaatlaag per server-proces; met RESULT_CACHE_URL (redis://… of een map) ook tussen processen
+    from deadhour.shared import DEFAULT_TTL, ResultCache, backend_from_url
+    return ResultCache(backend_from_url(secret("RESULT_CACHE_URL")), ttl=float(secret("RESULT_CACHE_TTL", DEFAULT_TTL)))
+
+
+@st.cache_resource
+def get_prefetcher():
+    # Achtergrond-warm-up per server-proces; alleen met PREFETCH_ENABLED
+    if not secret_flag("PREFETCH_ENABLED"):
+        return None
+    from deadhour.prefetch import DEFAULT_DAYS, DEFAULT_RATE, Prefetcher
+    return Prefetcher(
+        get_vemcount_client(), get_kpi_store(),
+        days=int(secret("PREFETCH_DAYS", DEFAULT_DAYS)),
+        interval=float(secret("PREFETCH_INTERVAL_MIN", 60)) * 60,
+        rate=float(secret("PREFETCH_RATE", DEFAULT_RATE)),
+        batch_size=int(secret("API_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        chunk_days=int(secret("API_CHUNK_DAYS", DEFAULT_CHUNK_DAYS)),
+    ).start()
+
+
+@st.cache_resource
+def get_replay_server():
+    # Met API_REPLAY_DIR draait de app tegen opgenomen fixtures in plaats van de live API
+    replay_dir = secret("API_REPLAY_DIR")
+    if not replay_dir:
+        return None
+    from datetime import date, timedelta
+    from deadhour.replay import ReplayServer, shift_to
+    server = ReplayServer(
+        replay_dir,
+        latency=float(secret("API_REPLAY_LATENCY", 0)),
+        jitter=float(secret("API_REPLAY_JITTER", 0)),
+        error_rate=float(secret("API_REPLAY_ERROR_RATE", 0)),
+        max_concurrent=int(secret("API_REPLAY_MAX_CONCURRENT", 0)),
+        seed=secret("API_REPLAY_SEED"),
+    )
+    if secret_flag("API_REPLAY_SHIFT_TO_TODAY"):
+        server.index.shift = timedelta(days=shift_to(server.index, date.today() - timedelta(days=1)))
+    return server.start()
+
+
+@st.cache_resource
+def get_vemcount_client() -> VemcountClient:
+    replay = get_replay_server()
+    settings = {
+        "pool_size": int(secret("API_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+        "timeout": (5, float(secret("API_TIMEOUT", 60))),
+        "streaming": secret_flag("API_STREAMING"),
+    }
+    api_url = replay.url if replay is not None else st.secrets["API_URL"]
+    # Met API_RECORD_DIR wordt elke response ook als fixture bewaard (zie deadhour.replay)
+    if secret("API_RECORD_DIR") and replay is None:
+        from deadhour.replay import RecordingClient
+        return RecordingClient(api_url, secret("API_RECORD_DIR"), **settings)
+    return VemcountClient(api_url, **settings)
+
+
+def report_fetch_issues(df, errors, prefix=""):
+    for message in errors:
+        st.error(f"{prefix}{message}")
+    if df.empty and not errors:
+        st.warning(f"{prefix}⚠️ De API gaf een lege dataset terug.")
+
+
+@contextmanager
+def fetch_progress():
+    """Voortgangsbalk voor gechunkte fetches: verschijnt pas vanaf twee delen en verdwijnt daarna weer."""
+    placeholder = st.empty()
+
+    def update(done, total):
+        if total > 1:
+            placeholder.progress(done / total, text=f"📥 Data ophalen: {done}/{total} delen")
+
+    try:
+        yield update
+    finally:
+        placeholder.empty()
+
+
+def _load_settings() -> dict:
+    return {
+        "batch_size": int(secret("API_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+        "max_workers": int(secret("API_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+        "flights": get_result_cache().flights,
+        "chunk_days": int(secret("API_CHUNK_DAYS", DEFAULT_CHUNK_DAYS)),
+        "retries": int(secret("API_CHUNK_RETRIES", DEFAULT_CHUNK_RETRIES)),
+    }
+
+
+def _load(shop_ids, start_date, end_date, start_hour, end_hour, kpis, metrics=None):
+    with fetch_progress() as progress:
+        return load_kpi_data_many(
+            shop_ids, start_date, end_date, start_hour, end_hour, kpis,
+            get_vemcount_client(), get_kpi_store(), get_kpi_cache(),
+            metrics=metrics, progress=progress, **_load_settings(),
+        )
+
+
+def get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour, kpis=KPI_OUTPUTS, metrics=None) -> pd.DataFrame:
+    df, errors = _load([shop_id], start_date, end_date, start_hour, end_hour, kpis, metrics)[shop_id]
+    report_fetch_issues(df, errors)
+    return df
+
+
+def get_kpi_data_for_stores(shop_ids, start_date, end_date, start_hour, end_hour, kpis=KPI_OUTPUTS, metrics=None) -> dict:
+    """Alle winkels tegelijk ophalen: gebatchte requests, parallel over één gedeelde connection pool."""
+    results = _load(shop_ids, start_date, end_date, start_hour, end_hour, kpis, metrics)
+
+    frames = {}
+    for shop_id in shop_ids:
+        df, errors = results[shop_id]
+        report_fetch_issues(df, errors, prefix=f"{SHOP_NAME_MAP.get(shop_id, shop_id)}: ")
+        frames[shop_id] = df
+    return frames
+
+
+# -----------------------------
+# Achtergrond-fetch met progressieve weergave
+# -----------------------------
+LOAD_POLL_SECONDS = 0.5
+
+
+def start_kpi_load(key, shop_ids, start_date, end_date, start_hour, end_hour, kpis=KPI_OUTPUTS, metrics=None):
+    """Start een fetch buiten de script-thread die de gedeelde SlotCube per binnengekomen deel bijwerkt.
+
+    Eén job per `key` per sessie; een nog lopende vorige job wordt geannuleerd."""
+    from deadhour.jobs import KPILoadJob
+
+    cancel_kpi_load(key)
+    job = KPILoadJob(
+        shop_ids, start_date, end_date, start_hour, end_hour, kpis,
+        get_vemcount_client(), get_kpi_store(), get_kpi_cache(), cube=get_slot_cube(), metrics=metrics,
+        **_load_settings(),
+    ).start()
+    st.session_state[f"kpi_load_{key}"] = job
+    return job
+
+
+def get_kpi_load(key):
+    return st.session_state.get(f"kpi_load_{key}")
+
+
+def cancel_kpi_load(key):
+    job = get_kpi_load(key)
+    if job is not None and job.running:
+        job.cancel()
+
+
+def render_kpi_load_status(job):
+    """Voortgangsbalk zolang de job loopt; daarna de foutmeldingen per winkel, zoals bij een directe fetch."""
+    if job is None:
+        return
+    if job.running:
+        done, total = job.chunks_done, job.chunks_total
+        st.progress(done / total if total else 0.0,
+                    text=f"📥 Data ophalen: {done}/{total} delen · voorlopige resultaten" if total else "📥 Data ophalen…")
+    elif job.cancelled:
+        st.info("⏹️ Ophalen gestopt omdat de selectie veranderde; de resultaten hieronder kunnen onvolledig zijn.")
+    elif job.error is not None:
+        st.error(describe_fetch_error(job.error))
+    else:
+        for shop_id in job.shop_ids:
+            df, errors = job.results[shop_id]
+            report_fetch_issues(df, errors, prefix=f"{SHOP_NAME_MAP.get(shop_id, shop_id)}: " if len(job.shop_ids) > 1 else "")
+
+
+def poll_kpi_load(job):
+    """Aan het eind van het script: zolang de job loopt kort wachten en de pagina opnieuw renderen."""
+    if job is not None and job.running:
+        job.wait(LOAD_POLL_SECONDS)
+        st.rerun()
+
+
+def get_cube_results(method, shop_ids, start_date, end_date, start_hour, end_hour, metrics=None, **kwargs) -> pd.DataFrame:
+    """SlotCube.simulate/bootstrap, gedeeld tussen sessies: dezelfde winkels, periode, parameters
+    en cube-inhoud worden één keer doorgerekend, ook als sessies er tegelijk om vragen."""
+    cube = get_slot_cube()
+    key = (
+        method, tuple(int(s) for s in shop_ids), str(start_date), str(end_date), int(start_hour), int(end_hour),
+        sorted(kwargs.items()), cube.fingerprint(shop_ids),
+    )
+    compute = getattr(cube, method)
+    return get_result_cache().get_or_compute(
+        key, lambda: compute(shop_ids, start_date, end_date, start_hour, end_hour, **kwargs), metrics=metrics,
+    )
+
+
+def render_prefetch_status():
+    """Status van de achtergrond-warm-up in de sidebar (niets als die uit staat)."""
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        return
+    status = prefetcher.status()
+    label = {"running": "🔄 Bezig met opwarmen", "idle": "✅ Data warm", "error": "⚠️ Opwarmen met fouten", "stopped": "⏹️ Gestopt"}
+    with st.sidebar:
+        st.markdown(f"**Prefetch:** {label.get(status['state'], status['state'])}")
+        if status["state"] == "running":
+            st.progress(status["shops_done"] / max(1, status["shops_total"]),
+                        text=f"{status['shops_done']}/{status['shops_total']} winkels")
+        if status["last_finished"]:
+            st.caption(f"Laatste run: {status['last_finished']:%H:%M} · {status['requests']} requests")
+        if status["next_run"]:
+            st.caption(f"Volgende run: {status['next_run']:%H:%M}")
+        for shop_id, message in status["errors"].items():
+            st.caption(f"{SHOP_NAME_MAP.get(shop_id, shop_id)}: {message}")
+
+
+# -----------------------------
+# Instrumentatie
+# -----------------------------
+def debug_enabled() -> bool:
+    # Aan via de secret DEBUG_METRICS of per sessie met ?debug=1 in de URL
+    return secret_flag("DEBUG_METRICS") or st.query_params.get("debug") in ("1", "true")
+
+
+def export_metrics():
+    """Schrijf de proces-totalen naar METRICS_FILE (Prometheus-tekstformaat), als die gezet is."""
+    path = secret("METRICS_FILE")
+    if path:
+        REGISTRY.write_textfile(path)
+
+
+def render_metrics_debug(*metrics):
+    metrics = list({id(m): m for m in metrics if m is not None}.values())
+    if not metrics or not debug_enabled():
+        return
+    with st.expander("🛠️ Debug: timing per stage"):
+        df = pd.concat([m.to_frame() for m in metrics], ignore_index=True)
+        totals = df.groupby("stage", sort=False).sum(numeric_only=True).reset_index() if not df.empty else df
+        st.dataframe(totals, use_container_width=True)
+        cache = get_kpi_cache()
+        st.caption(f"KPI-cache: {cache.hits} hits, {cache.misses} misses, {cache.nbytes / 1024 / 1024:.1f} MB")
+        shared = get_result_cache().stats()
+        st.caption(f"Gedeelde resultaten: {shared['hits']} hits, {shared['misses']} misses, "
+                   f"{shared['coalesced']} gedeelde calls, {shared['in_flight']} lopend")
+        replay = get_replay_server()
+        if replay is not None:
+            stats = replay.stats()
+            st.caption(f"Replay-API: {stats['requests']} requests ({stats['exact_hits']} exact, {stats['composed']} samengesteld), "
+                       f"{stats['errors']} geïnjecteerde fouten, {stats['rejected']} × 429, piek {stats['peak_concurrent']} gelijktijdig")
+        st.code(REGISTRY.prometheus_text(), language="text")
@@ -0,0 +1,266 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+HOUR_LABELS = [f"{h:02d}:00" for h in range(24)]
+
+SLOT_AGGREGATIONS = {
+    "count_in": "sum",
+    "conversion_rate": "mean",
+    "turnover": "sum",
+    "sales_per_visitor": "mean",
+    "sales_per_transaction": "mean",
+}
+
+
+def add_slot_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse `datetime` (alleen als dat nog niet gebeurd is) en voeg de integer slot-kolommen
+    `weekday_num` (0 = maandag) en `hour_num` toe. Labels worden pas na het groeperen gemaakt."""
+    if not pd.api.types.is_datetime64_any_dtype(df["datetime"]):
+        df["datetime"] = pd.to_datetime(df["datetime"])
+    df["weekday_num"] = df["datetime"].dt.dayofweek.astype("int8")
+    df["hour_num"] = df["hour"].astype("int8") if "hour" in df.columns else df["datetime"].dt.hour.astype("int8")
+    return df
+
+
+def label_slots(df: pd.DataFrame) -> pd.DataFrame:
+    """Zet weekday_num/hour_num om naar categorische weergavelabels ("Monday", "09:00").
+
+    Categorieën in kalendervolgorde, dus sorteren op weekday/hour gaat goed zonder extra stappen."""
+    df["weekday"] = pd.Categorical.from_codes(df["weekday_num"].to_numpy(), categories=WEEKDAYS, ordered=True)
+    df["hour"] = pd.Categorical.from_codes(df["hour_num"].to_numpy(), categories=HOUR_LABELS, ordered=True)
+    return df
+
+
+def simulate_slots(df: pd.DataFrame, group_keys=(), benchmark="store") -> pd.DataFrame:
+    """Aggregeer per (group_keys, weekdag, uur) en simuleer de uplift naar de gemiddelde SPV.
+
+    Met group_keys=["shop_id"] draait een hele keten in één groupby; de gemiddelde
+    SPV wordt dan per winkel bepaald, of met benchmark="chain" over de hele keten.
+    """
+    group_keys = list(group_keys)
+    if "weekday_num" not in df.columns or "hour_num" not in df.columns:
+        df = add_slot_columns(df.copy())
+
+    aggregations = {kpi: how for kpi, how in SLOT_AGGREGATIONS.items() if kpi in df.columns}
+    grouped = df.groupby(group_keys + ["weekday_num", "hour_num"], observed=True, sort=True).agg(
+        **{kpi: (kpi, how) for kpi, how in aggregations.items()},
+        visitors_mean=("count_in", "mean"),
+    ).reset_index()
+    # Uurdata is float32; de (kleine) slottabel rekent verder in float64
+    value_columns = [*aggregations, "visitors_mean"]
+    grouped[value_columns] = grouped[value_columns].astype("float64")
+
+    return apply_uplift(grouped, group_keys, benchmark)
+
+
+def apply_uplift(grouped: pd.DataFrame, group_keys=(), benchmark="store") -> pd.DataFrame:
+    """Til elk slot met SPV onder het gemiddelde op naar die gemiddelde SPV.
+
+    benchmark="store": gemiddelde per group_keys (per winkel); "chain": één gemiddelde over alle rijen.
+    """
+    group_keys = list(group_keys)
+    if benchmark not in ("store", "chain"):
+        raise ValueError(f"Onbekende benchmark {benchmark!r}; kies 'store' of 'chain'.")
+    if group_keys and benchmark == "store":
+        avg_spv = grouped.groupby(group_keys, observed=True)["sales_per_visitor"].transform("mean").to_numpy()
+    else:
+        avg_spv = grouped["sales_per_visitor"].mean()
+
+    turnover = grouped["turnover"].to_numpy()
+    grouped["avg_spv"] = avg_spv
+    grouped["original"] = turnover
+    grouped["uplift"] = np.where(grouped["sales_per_visitor"].to_numpy() < avg_spv,
+                                 grouped["count_in"].to_numpy() * avg_spv, turnover)
+    grouped["extra_turnover"] = grouped["uplift"] - grouped["turnover"]
+    return grouped
+
+
+def finalize_results(grouped: pd.DataFrame, group_keys=()) -> pd.DataFrame:
+    grouped = label_slots(grouped)
+    columns = list(group_keys) + ["weekday", "hour"] + [c for c in grouped.columns if c not in ("weekday", "hour", *group_keys)]
+    return grouped[columns].sort_values("extra_turnover", ascending=False)
+
+
+def find_deadhours_and_simulate(df: pd.DataFrame, group_keys=(), benchmark="store") -> pd.DataFrame:
+    return finalize_results(simulate_slots(df, group_keys, benchmark), group_keys)
+
+
+def deadhour_matrix(results: pd.DataFrame, value="extra_turnover"):
+    """Dichte winkel × weekdag × uur-array uit ketenresultaten (group_keys=["shop_id"]).
+
+    Geeft (shop_ids, uren, matrix) terug; lege slots zijn NaN. Eén scatter via integer-codes,
+    dus lineair in het aantal rijen, ook voor honderden winkels.
+    """
+    shop_codes, shop_ids = pd.factorize(results["shop_id"], sort=True)
+    hour_num = results["hour_num"].to_numpy()
+    hours = np.arange(hour_num.min(), hour_num.max() + 1) if len(results) else np.arange(0)
+
+    matrix = np.full((len(shop_ids), len(WEEKDAYS), len(hours)), np.nan)
+    if len(results):
+        matrix[shop_codes, results["weekday_num"].to_numpy(), hour_num - hours[0]] = results[value].to_numpy(dtype="float64")
+    return np.asarray(shop_ids), hours, matrix
+
+
+def chain_summary(results: pd.DataFrame) -> pd.DataFrame:
+    """Per winkel: gemiddelde SPV (benchmark), omzet, bezoekers en extra omzet per week, plus het sterkste slot."""
+    by_shop = results.groupby("shop_id", observed=True, sort=False)
+    summary = by_shop.agg(
+        avg_spv=("avg_spv", "first"),
+        spv=("sales_per_visitor", "mean"),
+        count_in=("count_in", "sum"),
+        turnover=("turnover", "sum"),
+        extra_turnover=("extra_turnover", "sum"),
+    )
+    best = results.loc[by_shop["extra_turnover"].idxmax(), ["shop_id", "weekday", "hour"]].set_index("shop_id")
+    summary = summary.join(best.rename(columns={"weekday": "best_weekday", "hour": "best_hour"}))
+    return summary.reset_index().sort_values("extra_turnover", ascending=False, ignore_index=True)
+
+
+def weekly_extra(df_results: pd.DataFrame) -> pd.DataFrame:
+    """Kopie met extra_turnover (en extra_lower/extra_upper) per voorkomen van het slot, d.w.z. per week.
+
+    Het aantal voorkomens is bezoekers-som / gemiddelde bezoekers per uur; slots zonder bezoekers hebben geen extra."""
+    visitors = df_results["count_in"].to_numpy(dtype="float64")
+    visitors_mean = df_results["visitors_mean"].to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        occurrences = np.where(visitors_mean > 0, visitors / visitors_mean, np.nan)
+    columns = [c for c in ("extra_turnover", "extra_lower", "extra_upper") if c in df_results.columns]
+    return df_results.assign(**{
+        column: np.nan_to_num(df_results[column].to_numpy(dtype="float64") / occurrences) for column in columns
+    })
+
+
+def best_deadhours_per_weekday(df_results: pd.DataFrame, min_visitors=0, weken_over=52, rank_by="extra_turnover") -> pd.DataFrame:
+    """Sterkste dead hour per weekdag met jaarpotentie en slot-KPI's, zoals de optimizer-pagina die toont.
+
+    Met bootstrap-resultaten (zie slot_cube.bootstrap_from_cube) kan rank_by="extra_lower":
+    dan wint per weekdag het uur met de hoogste ondergrens in plaats van de hoogste puntschatting.
+    Met een prognose (SlotCube.project) komt de realistische jaarpotentie uit forecast_extra.
+
+    extra_turnover (en het bootstrap-interval) zijn in de simulatie sommen over de hele
+    analyseperiode; hier worden ze per slot gedeeld door het aantal keer dat het slot in die
+    periode voorkwam, zodat de uitkomst per week is en naast de jaarprognose past.
+    """
+    df_results = weekly_extra(df_results)
+    value_columns = [c for c in ("extra_turnover", "extra_lower", "extra_upper", "forecast_extra") if c in df_results.columns]
+    best_deadhours = (
+        df_results[df_results[rank_by] > 0]
+        .groupby(["weekday", "hour"], observed=True)[value_columns]
+        .mean()
+        .reset_index()
+        .sort_values(rank_by, ascending=False)
+        .groupby("weekday", observed=True)
+        .head(1)
+        .reset_index(drop=True)
+    )
+
+    best_deadhours["Jaarpotentie (52w)"] = best_deadhours["extra_turnover"] * 52
+    if "forecast_extra" in best_deadhours.columns:
+        best_deadhours["Jaarpotentie (realistisch)"] = best_deadhours["forecast_extra"]
+    else:
+        best_deadhours["Jaarpotentie (realistisch)"] = best_deadhours["extra_turnover"] * weken_over
+
+    # Slot-gemiddelden komen uit dezelfde groupby als de simulatie
+    kpi_lookup = df_results[["weekday", "hour", "visitors_mean", "conversion_rate", "sales_per_transaction"]].rename(columns={
+        "visitors_mean": "Bezoekers",
+        "conversion_rate": "Conversie (%)",
+        "sales_per_transaction": "ATV (€)"
+    })
+
+    best_deadhours = best_deadhours.merge(kpi_lookup, on=["weekday", "hour"], how="left")
+    best_deadhours = best_deadhours[best_deadhours["Bezoekers"] >= min_visitors]
+    best_deadhours["Conversie (%)"] = best_deadhours["Conversie (%)"].apply(lambda x: x*100 if x < 1 else x)
+    return best_deadhours
+
+
+# -----------------------------
+# Scenario-sweep
+# -----------------------------
+SWEEP_PERCENTILES = (50, 60, 70, 75, 80, 90)
+SWEEP_UPLIFTS = (0.05, 0.10, 0.20, np.inf)  # inf = volledig tot de doel-SPV, zoals apply_uplift
+SWEEP_MIN_VISITORS = (0, 2, 5, 10)
+MEAN_TARGET = "gemiddelde"
+
+
+def opening_windows(first_hour, last_hour, min_hours=1):
+    """Alle openingsvensters (van, tot) binnen [first_hour, last_hour) van minstens `min_hours` uur."""
+    return [(start, end) for start in range(first_hour, last_hour) for end in range(start + min_hours, last_hour + 1)]
+
+
+def _sweep_shop(slots, windows, percentiles, uplifts, min_visitors):
+    hour = slots["hour_num"].to_numpy()
+    visitors = slots["count_in"].to_numpy(dtype="float64")
+    turnover = slots["turnover"].to_numpy(dtype="float64")
+    spv = slots["sales_per_visitor"].to_numpy(dtype="float64")
+    visitors_mean = slots["visitors_mean"].to_numpy(dtype="float64")
+
+    starts, ends = (np.array([w[i] for w in windows]) for i in (0, 1))
+    in_window = (hour >= starts[:, None]) & (hour < ends[:, None])  # (W, S)
+
+    # Doel-SPV per venster: het gemiddelde (zoals nu) en percentielen van de slot-SPV's in dat venster
+    spv_in_window = np.where(in_window, spv, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # lege vensters geven NaN
+        targets = [np.nanmean(spv_in_window, axis=1)]
+        if percentiles:
+            targets += list(np.nanpercentile(spv_in_window, percentiles, axis=1).reshape(len(percentiles), -1))
+    targets = np.column_stack(targets)
+    target_labels = [MEAN_TARGET] + [f"p{p}" for p in percentiles]
+
+    # extra = min(bezoekers·doel − omzet, uplift·omzet) voor slots onder het doel; alles (W, T, U, S)
+    uplifts = np.asarray(uplifts, dtype="float64")
+    headroom = visitors * targets[:, :, None] - turnover
+    lifted = in_window[:, None, :] & (spv < targets[:, :, None])
+    # Onbeperkte uplift = de volle ruimte tot het doel; niet inf·omzet, want 0·inf is NaN bij uren zonder omzet
+    unlimited = np.isinf(uplifts)
+    cap = np.where(unlimited, 0.0, uplifts)[:, None] * turnover
+    capped = np.where(unlimited[:, None], headroom[:, :, None, :], np.minimum(headroom[:, :, None, :], cap))
+    gain = np.where(lifted[:, :, None, :], capped, 0.0)
+
+    # Minimum bezoekers als (M, S)-masker: de laatste as wordt één matrixproduct
+    keep = (visitors_mean[None, :] >= np.asarray(min_visitors, dtype="float64")[:, None]).astype("float64")
+    n_slots = gain.shape[-1]
+    extra = (gain.reshape(-1, n_slots) @ keep.T).reshape(*gain.shape[:3], len(min_visitors))
+    lifted_slots = (lifted.reshape(-1, n_slots) @ keep.T).reshape(*lifted.shape[:2], len(min_visitors))
+    window_turnover = np.where(in_window, turnover, 0.0).sum(axis=1)
+
+    w, t, u, m = np.indices(extra.shape).reshape(4, -1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        extra_pct = extra[w, t, u, m] / window_turnover[w] * 100
+    return pd.DataFrame({
+        "start_hour": starts[w],
+        "end_hour": ends[w],
+        "target": np.asarray(target_labels)[t],
+        "target_spv": targets[w, t],
+        "uplift": uplifts[u],
+        "min_visitors": np.asarray(min_visitors)[m],
+        "extra_turnover": extra[w, t, u, m],
+        "lifted_slots": lifted_slots[w, t, m].astype("int64"),
+        "window_turnover": window_turnover[w],
+        "extra_pct": extra_pct,
+    })
+
+
+def sweep_scenarios(slots: pd.DataFrame, windows, percentiles=SWEEP_PERCENTILES, uplifts=SWEEP_UPLIFTS,
+                    min_visitors=SWEEP_MIN_VISITORS) -> pd.DataFrame:
+    """Reken een heel raster scenario's in één keer door op slotniveau (uitvoer van simulate_slots/SlotCube.simulate).
+
+    Assen: openingsvensters × doel-SPV (gemiddelde of percentiel binnen het venster) × conversie-uplift
+    (slot-SPV stijgt hoogstens met dat percentage, maximaal tot het doel) × minimum gemiddelde bezoekers.
+    Alles via broadcasting over (venster, doel, uplift, slot); duizenden scenario's per winkel kosten
+    milliseconden. Met "gemiddelde", uplift=inf en min_visitors=0 is extra_turnover gelijk aan de
+    som die find_deadhours_and_simulate voor dat venster geeft. Per winkel als er een shop_id-kolom is.
+    """
+    percentiles, uplifts, min_visitors = list(percentiles), list(uplifts), list(min_visitors)
+    if "shop_id" not in slots.columns:
+        return _sweep_shop(slots, windows, percentiles, uplifts, min_visitors)
+    frames = [
+        _sweep_shop(part, windows, percentiles, uplifts, min_visitors).assign(shop_id=shop_id)
+        for shop_id, part in slots.groupby("shop_id", sort=True)
+    ]
+    sweep = pd.concat(frames, ignore_index=True)
+    return sweep[["shop_id"] + [c for c in sweep.columns if c != "shop_id"]]
+
@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import pandas as pd
+
+from data_transformer import compact_kpi_frame
+
+# Gisteren kan nog aangevuld worden (late tellers, kassakoppeling): pas vanaf eergisteren is een dag af
+SETTLE_DAYS = 2
+# Dagen zonder rijen in een verder gevuld antwoord gelden pas na een week als gesloten dag
+CLOSED_DAY_DAYS = 7
+DEFAULT_STORE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def to_date(value) -> date:
+    return pd.to_datetime(value).date()
+
+
+def date_span(start_date, end_date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+
+def plan_missing_ranges(coverage, start_date, end_date, start_hour, end_hour):
+    """Bepaal welke (datum, uur)-cellen nog ontbreken en vat ze samen tot API-verzoeken.
+
+    `coverage` is een dict {date: set(uren)}. Resultaat is een lijst van
+    (van_datum, tot_datum, van_uur, tot_uur) met aaneengesloten datums die
+    hetzelfde uurvenster missen; tot_datum is inclusief, tot_uur exclusief.
+    """
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    window = set(range(start_hour, end_hour))
+    ranges = []
+
+    for day in date_span(start_date, end_date):
+        missing = window - coverage.get(day, set())
+        if not missing:
+            continue
+        hours = (min(missing), max(missing) + 1)
+        last = ranges[-1] if ranges else None
+        if last and last[1] == day - timedelta(days=1) and (last[2], last[3]) == hours:
+            ranges[-1] = (last[0], day, last[2], last[3])
+        else:
+            ranges.append((day, day, hours[0], hours[1]))
+
+    return ranges
+
+
+def complete_days(df, start_date, end_date, today=None):
+    """Dagen uit [start_date, end_date] die na een fetch met antwoord `df` als compleet mogen gelden.
+
+    Alleen afgesloten dagen (minstens SETTLE_DAYS oud). Dagen met rijen in het antwoord tellen
+    direct; dagen zonder rijen alleen als het antwoord verder wel data had én de dag minstens
+    CLOSED_DAY_DAYS oud is (een gesloten dag). Een leeg antwoord markeert niets: dat kan net
+    zo goed een haperende koppeling zijn, die willen we later opnieuw proberen.
+    """
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    today = today or date.today()
+    if df is None or df.empty:
+        return []
+    present = set(df["datetime"].dt.date.unique())
+    settled, closed = today - timedelta(days=SETTLE_DAYS), today - timedelta(days=CLOSED_DAY_DAYS)
+    return [day for day in date_span(start_date, min(end_date, settled)) if day in present or day <= closed]
+
+
+def split_range(fetch_range, chunk_days=None):
+    """Knip een (van, tot, van_uur, tot_uur)-bereik in delen van hoogstens `chunk_days` dagen.
+
+    Lange historie (bijv. jaar-op-jaar) wordt zo een reeks kleine requests die elk los
+    opgehaald, opgeslagen en zo nodig opnieuw geprobeerd kunnen worden."""
+    start_date, end_date, start_hour, end_hour = fetch_range
+    if not chunk_days:
+        return [fetch_range]
+    chunks = []
+    while start_date <= end_date:
+        chunk_end = min(end_date, start_date + timedelta(days=chunk_days - 1))
+        chunks.append((start_date, chunk_end, start_hour, end_hour))
+        start_date = chunk_end + timedelta(days=1)
+    return chunks
+
+
+class HourlyKPIStore:
+    """Lokale, per dag gepartitioneerde opslag van genormaliseerde uurdata.
+
+    Houdt per (shop_id, kpi-set) bij welke (datum, uur)-cellen al opgehaald zijn,
+    zodat alleen ontbrekende datumbereiken bij de API opgevraagd hoeven te worden.
+    Welke dagen als compleet gelden bepaalt complete_days. Boven `max_bytes` wordt de
+    langst niet gebruikte winkel vergeten (frame én coverage); die wordt dan opnieuw opgehaald.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_STORE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()  # (shop_id, kpis) -> DataFrame, minst recent gebruikt eerst
+        self._coverage = {}  # (shop_id, kpis) -> {date: set(uren)}
+        self._nbytes = {}    # (shop_id, kpis) -> geheugengebruik van het frame
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(shop_id, kpis):
+        return int(shop_id), tuple(sorted(kpis))
+
+    def missing_ranges(self, shop_id, kpis, start_date, end_date, start_hour, end_hour):
+        with self._lock:
+            coverage = self._coverage.get(self._key(shop_id, kpis), {})
+            return plan_missing_ranges(coverage, start_date, end_date, start_hour, end_hour)
+
+    def merge(self, shop_id, kpis, df, start_date, end_date, start_hour, end_hour, today=None):
+        """Vervang alle cellen in het opgehaalde bereik door `df` en markeer complete dagen (zie complete_days)."""
+        key = self._key(shop_id, kpis)
+        start_date, end_date = to_date(start_date), to_date(end_date)
+        today = today or date.today()
+
+        with self._lock:
+            existing = self._frames.get(key)
+            if existing is not None and not existing.empty:
+                days = existing["datetime"].dt.date
+                hours = existing["datetime"].dt.hour
+                stale = (days >= start_date) & (days <= end_date) & (hours >= start_hour) & (hours < end_hour)
+                existing = existing[~stale]
+                frames = [f for f in (existing, df) if not f.empty]
+                merged = pd.concat(frames, ignore_index=True) if frames else existing
+            else:
+                merged = df
+            if not merged.empty:
+                # concat van categorieën met verschillende winkelnamen wordt object; terug naar compact
+                merged = compact_kpi_frame(merged.sort_values("datetime").reset_index(drop=True))
+            self._store(key, merged)
+
+            coverage = self._coverage.setdefault(key, {})
+            for day in complete_days(df, start_date, end_date, today):
+                coverage.setdefault(day, set()).update(range(start_hour, end_hour))
+
+    def read(self, shop_id, kpis, start_date, end_date, start_hour, end_hour) -> pd.DataFrame:
+        start_date, end_date = to_date(start_date), to_date(end_date)
+        key = self._key(shop_id, kpis)
+        with self._lock:
+            df = self._frames.get(key)
+            if df is not None:
+                self._frames.move_to_end(key)
+        if df is None or df.empty:
+            return pd.DataFrame()
+        days = df["datetime"].dt.date
+        hours = df["datetime"].dt.hour
+        mask = (days >= start_date) & (days <= end_date) & (hours >= start_hour) & (hours < end_hour)
+        return df[mask].reset_index(drop=True)
+
+    def nbytes(self):
+        with self._lock:
+            return self._bytes
+
+    def _store(self, key, df):
+        self._bytes -= self._nbytes.pop(key, 0)
+        self._frames[key] = df
+        self._frames.move_to_end(key)
+        self._nbytes[key] = int(df.memory_usage(deep=True).sum())
+        self._bytes += self._nbytes[key]
+        # De zojuist opgeslagen winkel blijft altijd staan, ook als die alleen al boven het budget zit
+        while self._bytes > self.max_bytes and len(self._frames) > 1:
+            oldest = next(iter(self._frames))
+            self._frames.pop(oldest)
+            self._coverage.pop(oldest, None)
+            self._bytes -= self._nbytes.pop(oldest)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import pandas as pd
+
+# Vandaag is nog een open dag: kort houden. Afgesloten dagen veranderen niet meer.
+TODAY_TTL_SECONDS = 300
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def make_cache_key(shop_id, start_date, end_date, start_hour, end_hour, kpis):
+    return (
+        int(shop_id),
+        pd.to_datetime(start_date).strftime("%Y-%m-%d"),
+        pd.to_datetime(end_date).strftime("%Y-%m-%d"),
+        int(start_hour),
+        int(end_hour),
+        tuple(sorted(kpis)),
+    )
+
+
+def ttl_for_range(end_date, today=None, today_ttl=TODAY_TTL_SECONDS):
+    """TTL in seconden voor een datumbereik; None = verloopt nooit."""
+    today = today or date.today()
+    if pd.to_datetime(end_date).date() < today:
+        return None
+    return today_ttl
+
+
+def _frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+class KPICache:
+    """LRU-cache voor KPI-frames met TTL per entry, een geheugenbudget en optioneel een disk-laag."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (df, expires_at, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    # -----------------------------
+    # Publieke API
+    # -----------------------------
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                df, expires_at, _ = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return df.copy()
+                self._drop(key)
+
+        loaded = self._load_from_disk(key, now)
+        with self._lock:
+            if loaded is None:
+                self.misses += 1
+                return None
+            df, expires_at = loaded
+            self._store(key, df, expires_at)
+            self.hits += 1
+            return df.copy()
+
+    def put(self, key, df: pd.DataFrame, ttl=None):
+        expires_at = None if ttl is None else time.time() + ttl
+        df = df.copy()
+        with self._lock:
+            self._store(key, df, expires_at)
+        self._write_to_disk(key, df, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    # -----------------------------
+    # Intern
+    # -----------------------------
+    def _store(self, key, df, expires_at):
+        if key in self._entries:
+            self._drop(key)
+        nbytes = _frame_nbytes(df)
+        if nbytes > self.max_bytes:
+            return  # past niet in het budget; alleen de disk-laag houdt hem vast
+        self._entries[key] = (df, expires_at, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def _drop(self, key):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.pkl")
+
+    def _write_to_disk(self, key, df, expires_at):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            pickle.dump((key, expires_at, df), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _load_from_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as fh:
+                stored_key, expires_at, df = pickle.load(fh)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        if expires_at is not None and expires_at <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return df, expires_at
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+from data_transformer import compact_kpi_frame
+from fetch_planner import complete_days, plan_missing_ranges, date_span, to_date
+
+try:
+    import fcntl
+except ImportError:  # Windows: geen advisory locks, dan alleen de thread-lock
+    fcntl = None
+
+COVERAGE_FILE = "_coverage.json"
+LOCK_FILE = "_coverage.lock"
+DATA_FILE = "data.parquet"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("De Parquet KPI-store vereist het pakket 'pyarrow' (pip install pyarrow).") from e
+
+
+def _months(start_date, end_date):
+    return sorted({day.strftime("%Y-%m") for day in date_span(start_date, end_date)})
+
+
+class ParquetKPIStore:
+    """Lokaal KPI-warehouse op disk: Parquet, gepartitioneerd als shop_id=<id>/month=<YYYY-MM>.
+
+    Zelfde interface als HourlyKPIStore (missing_ranges / merge / read), zodat het fetch-pad
+    er ongewijzigd tegenaan kan praten. Reads pushen filters op winkel, maand, datum, uur en
+    KPI-kolommen naar pyarrow en lezen de bestanden memory-mapped.
+
+    Meerdere processen (de app en `python -m deadhour prefetch`) mogen dezelfde map delen:
+    schrijven gebeurt onder een file lock, de coverage wordt vóór het opslaan samengevoegd
+    met die op disk, en missing_ranges leest hem opnieuw in zodra een ander proces hem wijzigde.
+    """
+
+    def __init__(self, root):
+        _require_pyarrow()
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._coverage_mtime = None
+        self._coverage = self._load_coverage()
+
+    # -----------------------------
+    # Coverage (welke cellen zijn al opgehaald)
+    # -----------------------------
+    @staticmethod
+    def _key(shop_id, kpis):
+        return f"{int(shop_id)}|{','.join(sorted(kpis))}"
+
+    def _coverage_path(self):
+        return os.path.join(self.root, COVERAGE_FILE)
+
+    def _mtime(self):
+        try:
+            return os.stat(self._coverage_path()).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_coverage(self):
+        self._coverage_mtime = self._mtime()
+        try:
+            with open(self._coverage_path()) as fh:
+                raw = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        return {key: {date.fromisoformat(day): set(hours) for day, hours in days.items()} for key, days in raw.items()}
+
+    def _refresh_coverage(self):
+        # Een ander proces (bijv. de prefetch-worker) kan intussen delen toegevoegd hebben
+        if self._mtime() != self._coverage_mtime:
+            self._coverage = self._load_coverage()
+
+    def _save_coverage(self):
+        raw = {key: {day.isoformat(): sorted(hours) for day, hours in days.items()} for key, days in self._coverage.items()}
+        path = self._coverage_path()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(raw, fh)
+        os.replace(tmp_path, path)
+        self._coverage_mtime = self._mtime()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusief tussen processen die dezelfde map delen (no-op zonder fcntl)."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, LOCK_FILE), "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def missing_ranges(self, shop_id, kpis, start_date, end_date, start_hour, end_hour):
+        with self._lock:
+            self._refresh_coverage()
+            coverage = self._coverage.get(self._key(shop_id, kpis), {})
+            return plan_missing_ranges(coverage, start_date, end_date, start_hour, end_hour)
+
+    # -----------------------------
+    # Schrijven
+    # -----------------------------
+    def _partition_path(self, shop_id, month):
+        return os.path.join(self.root, f"shop_id={int(shop_id)}", f"month={month}", DATA_FILE)
+
+    def _write_partition(self, shop_id, month, df, kpis, start_date, end_date, start_hour, end_hour):
+        """Vervang de cellen van het opgehaalde bereik in één maandpartitie door `df` (zoals HourlyKPIStore.merge)."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = self._partition_path(shop_id, month)
+        if os.path.exists(path):
+            existing = pq.read_table(path, memory_map=True).to_pandas()
+            days, hours = existing["datetime"].dt.date, existing["datetime"].dt.hour
+            refetched = (days >= start_date) & (days <= end_date) & (hours >= start_hour) & (hours < end_hour)
+            # Rijen die de nieuwe fetch niet meer teruggaf verdwijnen; alleen KPI-kolommen die deze
+            # fetch niet opvroeg (van een eerdere fetch met een andere kpi-set) blijven per uur behouden
+            other = [c for c in existing.columns if c not in df.columns and c not in kpis]
+            if other and not df.empty:
+                df = df.merge(existing.loc[refetched, ["datetime"] + other], on="datetime", how="left")
+            frames = [f for f in (existing[~refetched], df) if not f.empty]
+            df = pd.concat(frames, ignore_index=True) if frames else existing.iloc[:0]
+        elif df.empty:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = df.sort_values("datetime").reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # Tijdelijk bestand met "."-prefix: wordt door dataset-discovery genegeerd
+        tmp_path = os.path.join(os.path.dirname(path), f".{DATA_FILE}.{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def merge(self, shop_id, kpis, df, start_date, end_date, start_hour, end_hour, today=None):
+        start_date, end_date = to_date(start_date), to_date(end_date)
+        today = today or date.today()
+
+        with self._lock, self._file_lock():
+            marked = complete_days(df, start_date, end_date, today)
+            if not df.empty:
+                # Ook maanden uit het bereik zonder nieuwe rijen: daar verdwijnen de opnieuw opgehaalde cellen
+                df = df.drop(columns=["shop_id"], errors="ignore")
+                parts = dict(tuple(df.groupby(df["datetime"].dt.strftime("%Y-%m"), sort=False)))
+                for month in _months(start_date, end_date):
+                    part = parts.get(month, df.iloc[:0])
+                    self._write_partition(shop_id, month, part, kpis, start_date, end_date, start_hour, end_hour)
+
+            # Onder de file lock is de versie op disk de volledige stand van alle processen: die inlezen
+            # en aanvullen, zodat updates van andere processen niet overschreven worden
+            self._coverage = self._load_coverage()
+            coverage = self._coverage.setdefault(self._key(shop_id, kpis), {})
+            for day in marked:
+                coverage.setdefault(day, set()).update(range(start_hour, end_hour))
+            self._save_coverage()
+
+    # -----------------------------
+    # Lezen met partition pruning
+    # -----------------------------
+    def read_many(self, shop_ids, kpis, start_date, end_date, start_hour, end_hour) -> pd.DataFrame:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        start_date, end_date = to_date(start_date), to_date(end_date)
+        partitioning = ds.partitioning(pa.schema([("shop_id", pa.int32()), ("month", pa.string())]), flavor="hive")
+        if not any(name.startswith("shop_id=") for name in os.listdir(self.root)):
+            return pd.DataFrame()
+        dataset = ds.dataset(
+            self.root,
+            format="parquet",
+            partitioning=partitioning,
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+            exclude_invalid_files=False,
+            ignore_prefixes=[".", "_"],
+        )
+
+        columns = ["shop_id", "shop_name", "datetime"] + [k for k in kpis if k in dataset.schema.names] + ["hour"]
+        columns = [c for c in columns if c in dataset.schema.names]
+        datetime_type = dataset.schema.field("datetime").type
+        start_ts = pa.scalar(pd.Timestamp(start_date), type=datetime_type)
+        end_ts = pa.scalar(pd.Timestamp(end_date + timedelta(days=1)), type=datetime_type)
+        expression = (
+            ds.field("shop_id").isin([int(s) for s in shop_ids])
+            & ds.field("month").isin(_months(start_date, end_date))
+            & (ds.field("datetime") >= start_ts) & (ds.field("datetime") < end_ts)
+            & (ds.field("hour") >= start_hour) & (ds.field("hour") < end_hour)
+        )
+
+        with self._lock:
+            table = dataset.to_table(columns=columns, filter=expression)
+        if table.num_rows == 0:
+            return pd.DataFrame()
+        # Partities van vóór het compacte schema (float64, `day`-kolom) worden hier omgezet
+        df = compact_kpi_frame(table.to_pandas())
+        return df.sort_values(["shop_id", "datetime"], kind="stable").reset_index(drop=True)
+
+    def read(self, shop_id, kpis, start_date, end_date, start_hour, end_hour) -> pd.DataFrame:
+        return self.read_many([shop_id], kpis, start_date, end_date, start_hour, end_hour)
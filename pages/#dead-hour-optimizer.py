@@ -4,99 +4,23 @@ import streamlit as st
 import sys
 import os
 import pandas as pd
-import requests
 import plotly.express as px
 from datetime import date, timedelta
-from urllib.parse import urlencode
-
-st.cache_data.clear()  # 🚨 Forceer het legen van de cache vóór de import
 
 # 👇 Zet dit vóór de import!
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
 
-# ✅ Nu pas importeren
+# ✅ Nu pas importeren: ophalen en simulatie komen uit de gedeelde deadhour-library
 from shop_mapping import SHOP_NAME_MAP
-from data_transformer import normalize_vemcount_response
+from deadhour_engine import find_deadhours_and_simulate
+from deadhour.metrics import StageMetrics
+from deadhour.ui import export_metrics, get_kpi_data_for_store, render_metrics_debug
 
 # -----------------------------
 # CONFIGURATIE
 # -----------------------------
-API_URL = st.secrets["API_URL"].rstrip("/")
 DEFAULT_SHOP_IDS = list(SHOP_NAME_MAP.keys())
 
-# -----------------------------
-# API CLIENT (GEFIXT)
-# -----------------------------
-def get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour) -> pd.DataFrame:
-    start_date = pd.to_datetime(start_date).strftime("%Y-%m-%d")
-    end_date = pd.to_datetime(end_date).strftime("%Y-%m-%d")
-
-    params = [
-        ("data", shop_id),
-        ("data_output", "count_in"),
-        ("data_output", "conversion_rate"),
-        ("data_output", "turnover"),
-        ("data_output", "sales_per_visitor"),
-        ("data_output", "sales_per_transaction"),
-        ("source", "shops"),
-        ("period", "date"),
-        ("form_date_from", start_date),
-        ("form_date_to", end_date),
-        ("step", "hour"),
-        ("show_hours_from", f"{start_hour:02d}:00"),
-        ("show_hours_to", f"{end_hour:02d}:00")
-    ]
-
-    # 🔐 Belangrijk: encode querystring zónder %3A in tijdvelden
-    query_string = urlencode(params, doseq=True).replace('%3A', ':')
-    url = f"{API_URL}?{query_string}"
-
-    try:
-        response = requests.post(url)  # GEEN params, alles zit in URL
-        st.write("📦 API response (debug)", response.text)
-
-        if response.status_code == 200:
-            raw_data = response.json()
-            if "data" in raw_data and raw_data["data"]:
-                df = normalize_vemcount_response(raw_data)
-                df["hour"] = pd.to_datetime(df["datetime"]).dt.hour
-                df = df[(df["hour"] >= start_hour) & (df["hour"] < end_hour)]
-                return df
-            else:
-                st.warning("⚠️ De API gaf een lege dataset terug.")
-        else:
-            st.error(f"❌ Error fetching data: {response.status_code} - {response.text}")
-    except Exception as e:
-        st.error(f"🚨 API call exception: {e}")
-
-    return pd.DataFrame()
-
-
-# -----------------------------
-# SIMULATIE
-# -----------------------------
-def find_deadhours_and_simulate(df: pd.DataFrame) -> pd.DataFrame:
-    df["weekday"] = pd.to_datetime(df["datetime"]).dt.day_name()
-    df["hour"] = pd.to_datetime(df["datetime"]).dt.strftime("%H:00")
-    df["datetime"] = pd.to_datetime(df["datetime"])
-
-    df_grouped = df.groupby(["weekday", "hour"]).agg({
-        "count_in": "sum",
-        "conversion_rate": "mean",
-        "turnover": "sum",
-        "sales_per_visitor": "mean",
-        "sales_per_transaction": "mean"
-    }).reset_index()
-
-    avg_spv = df_grouped["sales_per_visitor"].mean()
-    df_grouped["original"] = df_grouped["turnover"]
-    df_grouped["uplift"] = df_grouped.apply(
-        lambda row: row["count_in"] * avg_spv if row["sales_per_visitor"] < avg_spv else row["turnover"], axis=1)
-    df_grouped["extra_turnover"] = df_grouped["uplift"] - df_grouped["turnover"]
-    df_grouped["growth_pct"] = (df_grouped["extra_turnover"] / df_grouped["turnover"]).replace([float('inf'), -float('inf')], 0)
-
-    return df_grouped.sort_values("extra_turnover", ascending=False)
-
 # -----------------------------
 # STREAMLIT UI
 # -----------------------------
@@ -127,15 +51,13 @@ st.markdown(f"🗓 Analyseperiode: **{start_date.strftime('%Y-%m-%d')}** t/m **{
 
 if st.button("🔍 Analyseer Dead Hours"):
     start_hour, end_hour = opening_hours
+    metrics = StageMetrics(page="#dead-hour-optimizer", shops=1)
     with st.spinner("Data ophalen en analyseren..."):
-        df_kpi = get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour)
-
-    st.write("🔁 Rijen gevonden:", len(df_kpi))
-    st.dataframe(df_kpi.head())
-    st.write("✅ Columns in df_kpi:", df_kpi.columns.tolist())
+        df_kpi = get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour, metrics=metrics)
 
     if not df_kpi.empty:
-        df_results = find_deadhours_and_simulate(df_kpi)
+        with metrics.stage("simulate", rows=len(df_kpi)):
+            df_results = find_deadhours_and_simulate(df_kpi)
 
         st.subheader(f"📊 Dead hours voor {selected_name}")
         display_df = df_results[[
@@ -174,3 +96,6 @@ if st.button("🔍 Analyseer Dead Hours"):
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("⚠️ Geen data beschikbaar voor deze periode.")
+
+    export_metrics()
+    render_metrics_debug(metrics)
@@ -0,0 +1,116 @@
+# 🗺️ Dead Hour Matrix – hele keten in één overzicht
+
+import streamlit as st
+import sys
+import os
+import pandas as pd
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
+
+from shop_mapping import SHOP_NAME_MAP
+from deadhour_engine import chain_summary
+from deadhour.charts import HEATMAP_COLUMNS, cached_figure, chain_heatmap_figure
+from deadhour.formatting import fmt_eur, format_eur, format_eur2, format_frame, format_int
+from deadhour.metrics import StageMetrics
+from deadhour.ui import (
+    cancel_kpi_load, export_metrics, get_cube_results, get_kpi_load, poll_kpi_load, render_kpi_load_status,
+    render_metrics_debug, render_prefetch_status, start_kpi_load,
+)
+
+st.set_page_config(page_title="Dead Hour Matrix", layout="wide")
+
+# ─────────────────────────  Weergave  ─────────────────────────
+def render_chain_matrix(results: pd.DataFrame, metrics):
+    if results.empty:
+        st.warning("⚠️ Geen data beschikbaar voor deze periode.")
+        return
+
+    with metrics.stage("render_prep", rows=len(results)):
+        summary = chain_summary(results)
+
+    st.markdown(f"**{len(summary)} winkels** · totale potentie {fmt_eur(summary['extra_turnover'].sum())} extra omzet in de analyseperiode")
+
+    # Winkel × (weekdag, uur); bij veel winkels automatisch geaggregeerd
+    with metrics.stage("figure", rows=len(results)):
+        fig, note = cached_figure("chain_heatmap", chain_heatmap_figure, results[HEATMAP_COLUMNS], shop_names=SHOP_NAME_MAP)
+    if note:
+        st.caption(f"ℹ️ Vereenvoudigde weergave: {note}.")
+    st.plotly_chart(fig, use_container_width=True, key="chain_matrix")
+
+    disp = summary.assign(shop_name=summary["shop_id"].map(lambda sid: SHOP_NAME_MAP.get(int(sid), str(sid))))
+    disp = disp[["shop_name", "avg_spv", "spv", "count_in", "turnover", "extra_turnover", "best_weekday", "best_hour"]].rename(columns={
+        "shop_name": "Winkel",
+        "avg_spv": "Benchmark SPV",
+        "spv": "Gem. SPV winkel",
+        "count_in": "Bezoekers",
+        "turnover": "Omzet",
+        "extra_turnover": "Extra omzet",
+        "best_weekday": "Sterkste weekdag",
+        "best_hour": "Sterkste uur",
+    })
+    st.dataframe(
+        format_frame(disp, {
+            "Benchmark SPV": format_eur2,
+            "Gem. SPV winkel": format_eur2,
+            "Bezoekers": format_int,
+            "Omzet": format_eur,
+            "Extra omzet": format_eur,
+        }),
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption("💡 Benchmark SPV is het gemiddelde waar zwakke uren naartoe getild worden: per winkel, of één ketengemiddelde.")
+
+# ─────────────────────────  UI  ─────────────────────────
+st.title("🗺️ Dead Hour Matrix")
+st.markdown("Vergelijk de dead hours van alle winkels in één oogopslag.")
+render_prefetch_status()
+
+NAME_TO_ID = {v: k for k, v in SHOP_NAME_MAP.items()}
+
+selected_names = st.multiselect("Selecteer winkels", options=list(NAME_TO_ID.keys()), default=list(NAME_TO_ID.keys()))
+shop_ids = [NAME_TO_ID[name] for name in selected_names]
+
+# Tot drie jaar terug (jaar-op-jaar); lange bereiken worden in delen opgehaald
+days = st.slider("Analyseer over hoeveel dagen terug?", min_value=7, max_value=3 * 364, step=7, value=30)
+end_date = date.today()
+start_date = end_date - timedelta(days=days)
+
+opening_hours = st.slider("⏰ Selecteer openingstijden", min_value=0, max_value=24, value=(9, 19), step=1, format="%02d:00")
+benchmark = st.radio("📏 Til zwakke uren op naar:", ["Gemiddelde SPV van de winkel", "Gemiddelde SPV van de keten"], horizontal=True)
+
+metrics = StageMetrics(page="chain-dead-hour-matrix", shops=len(shop_ids))
+
+if st.button("🔍 Analyseer keten", type="secondary"):
+    start_hour, end_hour = opening_hours
+    # Ophalen buiten de script-thread; de matrix vult zich per binnengekomen winkel/datumdeel
+    start_kpi_load("chain", shop_ids, start_date, end_date, start_hour, end_hour,
+                   metrics=StageMetrics(page="chain-dead-hour-matrix", shops=len(shop_ids)))
+    st.session_state["chain_query"] = {"shop_ids": shop_ids, "start_date": start_date, "end_date": end_date, "hours": opening_hours}
+
+job = get_kpi_load("chain")
+if job is not None and job.running and not job.matches(shop_ids, start_date, end_date, *opening_hours):
+    cancel_kpi_load("chain")  # selectie gewijzigd: niet verder ophalen voor de oude
+
+query = st.session_state.get("chain_query")
+if query is not None:
+    render_kpi_load_status(job)
+    if not query["shop_ids"]:
+        st.warning("⚠️ Selecteer minimaal één winkel.")
+    else:
+        start_hour, end_hour = query["hours"]
+        with metrics.stage("simulate") as record:
+            results = get_cube_results(
+                "simulate", query["shop_ids"], query["start_date"], query["end_date"], start_hour, end_hour, metrics=metrics,
+                group_keys=["shop_id"], benchmark="chain" if benchmark.endswith("keten") else "store",
+            )
+            record["rows"] = len(results)
+        if results.empty and job is not None and job.running:
+            st.info("⏳ Nog geen data binnen; de matrix verschijnt zodra het eerste deel er is.")
+        else:
+            render_chain_matrix(results, metrics)
+
+    export_metrics()
+    render_metrics_debug(metrics, job.metrics if job is not None else None)
+    poll_kpi_load(job)
@@ -4,19 +4,21 @@ import streamlit as st
 import sys
 import os
 import pandas as pd
-import requests
-import plotly.express as px
 from datetime import date, timedelta
-from urllib.parse import urlencode
 import numpy as np
 
-st.cache_data.clear()
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
 
 from shop_mapping import SHOP_NAME_MAP
-from data_transformer import normalize_vemcount_response
+from deadhour_engine import WEEKDAYS, best_deadhours_per_weekday
+from deadhour.charts import cached_figure, deadhour_bar_figure
+from deadhour.formatting import fmt_eur, format_eur, format_frame, format_int, format_pct
+from deadhour.metrics import StageMetrics
+from deadhour.ui import (
+    cancel_kpi_load, export_metrics, get_cube_results, get_kpi_load, get_slot_cube, poll_kpi_load,
+    render_kpi_load_status, render_metrics_debug, render_prefetch_status, start_kpi_load,
+)
 
-API_URL = st.secrets["API_URL"].rstrip("/")
 DEFAULT_SHOP_IDS = list(SHOP_NAME_MAP.keys())
 
 # ─────────────────────────  Styling (matcht sqm-calc)  ─────────────────────────
@@ -42,223 +44,168 @@ button[data-testid="stBaseButton-secondary"]:hover{background:#d13c30!important;
 # Kleuren
 pfm_purple = "#762181"  # ter referentie; bars gebruiken Viridis zoals gevraagd
 
-# ─────────────────────────  Format helpers (EU)  ─────────────────────────
-def fmt_eur(x):
-    try:
-        return ("€{:,.0f}".format(float(x))).replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "€0"
-
-def fmt_eur2(x):
-    try:
-        return ("€{:,.2f}".format(float(x))).replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "€0,00"
-
-def fmt_pct(x):
-    try:
-        return ("{:,.1f}%".format(float(x))).replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "0,0%"
-
-def fmt_int(x):
-    try:
-        return ("{:,.0f}".format(float(x))).replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return "0"
-
-# ─────────────────────────  Data functies (ongewijzigd)  ─────────────────────────
-def get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour) -> pd.DataFrame:
-    start_date = pd.to_datetime(start_date).strftime("%Y-%m-%d")
-    end_date = pd.to_datetime(end_date).strftime("%Y-%m-%d")
-
-    params = [
-        ("data", shop_id),
-        ("data_output", "count_in"),
-        ("data_output", "conversion_rate"),
-        ("data_output", "turnover"),
-        ("data_output", "sales_per_visitor"),
-        ("data_output", "sales_per_transaction"),
-        ("source", "shops"),
-        ("period", "date"),
-        ("form_date_from", start_date),
-        ("form_date_to", end_date),
-        ("step", "hour"),
-        ("show_hours_from", f"{start_hour:02d}:00"),
-        ("show_hours_to", f"{end_hour:02d}:00")
-    ]
-
-    query_string = urlencode(params, doseq=True).replace('%3A', ':')
-    url = f"{API_URL}?{query_string}"
-
-    try:
-        response = requests.post(url)
-        if response.status_code == 200:
-            raw_data = response.json()
-            if "data" in raw_data and raw_data["data"]:
-                df = normalize_vemcount_response(raw_data)
-                df["hour"] = pd.to_datetime(df["datetime"]).dt.hour
-                df = df[(df["hour"] >= start_hour) & (df["hour"] < end_hour)]
-                return df
-            else:
-                st.warning("⚠️ De API gaf een lege dataset terug.")
-        else:
-            st.error(f"❌ Error fetching data: {response.status_code}")
-    except Exception as e:
-        st.error(f"🚨 API call exception: {e}")
-
-    return pd.DataFrame()
-
-def find_deadhours_and_simulate(df: pd.DataFrame) -> pd.DataFrame:
-    df["weekday"] = pd.to_datetime(df["datetime"]).dt.day_name()
-    df["hour"] = pd.to_datetime(df["datetime"]).dt.strftime("%H:00")
-    df["datetime"] = pd.to_datetime(df["datetime"])
-
-    df_grouped = df.groupby(["weekday", "hour"]).agg({
-        "count_in": "sum",
-        "conversion_rate": "mean",
-        "turnover": "sum",
-        "sales_per_visitor": "mean",
-        "sales_per_transaction": "mean"
-    }).reset_index()
-
-    avg_spv = df_grouped["sales_per_visitor"].mean()
-    df_grouped["original"] = df_grouped["turnover"]
-    df_grouped["uplift"] = df_grouped.apply(
-        lambda row: row["count_in"] * avg_spv if row["sales_per_visitor"] < avg_spv else row["turnover"], axis=1)
-    df_grouped["extra_turnover"] = df_grouped["uplift"] - df_grouped["turnover"]
-
-    return df_grouped.sort_values("extra_turnover", ascending=False)
+# ─────────────────────────  Analyse & weergave  ─────────────────────────
+def render_dead_hour_analysis(df_results: pd.DataFrame, toggle: str, min_visitors: int, key: str = "", metrics=None):
+    metrics = metrics if metrics is not None else StageMetrics()
+    if df_results.empty:
+        st.warning("⚠️ Geen data beschikbaar voor deze periode.")
+        return
+
+    vandaag = date.today()
+    jaar_einde = date(vandaag.year, 12, 31)
+    weken_over = 52 if toggle == "Volledig jaar (52 weken)" else ((jaar_einde - vandaag).days) // 7
+
+    # Bootstrap-resultaten rangschikken op de ondergrens van het interval
+    rank_by = "extra_lower" if "extra_lower" in df_results.columns else "extra_turnover"
+    with metrics.stage("render_prep") as record:
+        best_deadhours = best_deadhours_per_weekday(df_results, min_visitors, weken_over, rank_by=rank_by)
+        record["rows"] = len(best_deadhours)
+
+    top_5 = best_deadhours.nlargest(5, rank_by)
+    week_sum = top_5["extra_turnover"].sum()
+    year_sum = top_5["Jaarpotentie (realistisch)"].sum()
+    basis_note = "Gebaseerd op de geselecteerde analyseperiode en filters."
+    if "forecast_extra" in df_results.columns:
+        basis_note = "Prognose t/m 31 december met een seizoensmodel per weekdag × uur."
+    interval_note = ""
+    if rank_by == "extra_lower":
+        interval_note = f" · 90%-interval {fmt_eur(top_5['extra_lower'].sum())} – {fmt_eur(top_5['extra_upper'].sum())} per week"
+
+    # Oranje summary box (als in sqm-calc) + witregel erna
+    st.markdown(f"""
+    <div class="block-orange">
+      <div style="font-weight:700;font-size:1.05rem">🚀 Top 5 dead hours leveren potentieel op:</div>
+      <div class="kpi" style="margin-top:4px">{fmt_eur(week_sum)} per week ≈ {fmt_eur(year_sum)} per jaar</div>
+      <div class="note">{basis_note}{interval_note}</div>
+    </div>""", unsafe_allow_html=True)
+    st.markdown('<div class="h-gap"></div>', unsafe_allow_html=True)  # ← witregel
+
+    # Sortering weekdagen
+    ordered_days = WEEKDAYS
+    best_deadhours["weekday"] = pd.Categorical(best_deadhours["weekday"], categories=ordered_days, ordered=True)
+    best_deadhours = best_deadhours.sort_values(["weekday", "hour"])
+
+    # Tabel in EU‑notatie (zoals gevraagd)
+    interval_columns = ["extra_lower", "extra_upper"] if rank_by == "extra_lower" else []
+    disp = best_deadhours[[
+        "weekday", "hour", "extra_turnover", *interval_columns,
+        "Jaarpotentie (52w)", "Jaarpotentie (realistisch)",
+        "Bezoekers", "Conversie (%)", "ATV (€)"
+    ]].rename(columns={
+        "weekday": "Weekdag",
+        "hour": "Uur",
+        "extra_turnover": "Extra omzet (per week)",
+        "extra_lower": "Ondergrens (90%)",
+        "extra_upper": "Bovengrens (90%)"
+    })
+
+    st.dataframe(
+        format_frame(disp, {
+            "Extra omzet (per week)": format_eur,
+            "Ondergrens (90%)": format_eur,
+            "Bovengrens (90%)": format_eur,
+            "Jaarpotentie (52w)": format_eur,
+            "Jaarpotentie (realistisch)": format_eur,
+            "Bezoekers": format_int,
+            "Conversie (%)": format_pct,
+            "ATV (€)": format_eur
+        }),
+        use_container_width=True
+    )
+
+    st.caption("💡 *SPV = Conversie × Bonbedrag (ATV)* — deze tabel laat zien hoeveel extra omzet te winnen is per uur per weekdag.")
+
+    # Bar chart: Viridis palet per 'uur'; labels en hover worden in de browser geformatteerd
+    with metrics.stage("figure", rows=len(best_deadhours)):
+        fig2 = cached_figure("deadhour_bar", deadhour_bar_figure, best_deadhours)
+    st.plotly_chart(fig2, use_container_width=True, key=f"deadhours_chart_{key}")
 
 # ─────────────────────────  UI  ─────────────────────────
 st.title("🧐 Dead Hour Optimizer")
 st.markdown("Simuleer omzetgroei door structureel zwakke uren te verbeteren op basis van sales per visitor.")
+render_prefetch_status()
 
 ID_TO_NAME = SHOP_NAME_MAP
 NAME_TO_ID = {v: k for k, v in SHOP_NAME_MAP.items()}
 
-selected_name = st.selectbox("Selecteer een winkel", options=list(NAME_TO_ID.keys()), index=0)
-shop_id = NAME_TO_ID[selected_name]
+mode = st.radio("🏬 Analyse voor:", ["Eén winkel", "Meerdere winkels"], horizontal=True)
+if mode == "Eén winkel":
+    selected_names = [st.selectbox("Selecteer een winkel", options=list(NAME_TO_ID.keys()), index=0)]
+else:
+    selected_names = st.multiselect("Selecteer winkels", options=list(NAME_TO_ID.keys()), default=list(NAME_TO_ID.keys()))
+shop_ids = [NAME_TO_ID[name] for name in selected_names]
 
-days = st.slider("Analyseer over hoeveel dagen terug?", min_value=7, max_value=90, step=7, value=30)
+# Tot drie jaar terug (jaar-op-jaar); lange bereiken worden in delen opgehaald
+days = st.slider("Analyseer over hoeveel dagen terug?", min_value=7, max_value=3 * 364, step=7, value=30)
 end_date = date.today()
 start_date = end_date - timedelta(days=days)
 
 opening_hours = st.slider("⏰ Selecteer openingstijden", min_value=0, max_value=24, value=(9, 19), step=1, format="%02d:00")
 min_visitors = st.slider("Minimaal gemiddeld aantal bezoekers per uur (filter)", min_value=0, max_value=20, value=2, step=1)
 
-toggle = st.radio("🔁 Toon omzetpotentie op basis van:", ["Resterend jaar", "Volledig jaar (52 weken)"], horizontal=True)
+toggle = st.radio("🔁 Toon omzetpotentie op basis van:", ["Resterend jaar", "Volledig jaar (52 weken)", "Prognose resterend jaar"],
+                  horizontal=True, help="Prognose: trend en seizoen per weekdag × uur doorgetrokken tot 31 december.")
+statistical = st.toggle("📐 Statistische modus: rangschik op ondergrens van een bootstrap-interval (90%)",
+                        help="Uren met weinig bezoekers en veel spreiding tussen weken zakken dan in de ranking.")
 
 btn = st.button("🔍 Analyseer Dead Hours", type="secondary")
 
+# Eén StageMetrics per run van de pagina; de fetch-stages staan in die van de achtergrond-job
+metrics = StageMetrics(page="dead-hour-optimizer", shops=len(shop_ids))
+
 if btn:
     start_hour, end_hour = opening_hours
-    with st.spinner("Data ophalen en analyseren..."):
-        df_kpi = get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour)
-
-    if not df_kpi.empty:
-        df_results = find_deadhours_and_simulate(df_kpi)
-
-        best_deadhours = (
-            df_results[df_results["extra_turnover"] > 0]
-            .groupby(["weekday", "hour"])["extra_turnover"]
-            .mean()
-            .reset_index()
-            .sort_values("extra_turnover", ascending=False)
-            .groupby("weekday")
-            .head(1)
-            .reset_index(drop=True)
-        )
-
-        vandaag = date.today()
-        jaar_einde = date(vandaag.year, 12, 31)
-        weken_over = 52 if toggle == "Volledig jaar (52 weken)" else ((jaar_einde - vandaag).days) // 7
-
-        best_deadhours["Jaarpotentie (52w)"] = best_deadhours["extra_turnover"] * 52
-        best_deadhours["Jaarpotentie (realistisch)"] = best_deadhours["extra_turnover"] * weken_over
-
-        df_kpi["weekday"] = pd.to_datetime(df_kpi["datetime"]).dt.day_name()
-        df_kpi["hour"] = pd.to_datetime(df_kpi["datetime"]).dt.strftime("%H:00")
-
-        kpi_lookup = df_kpi.groupby(["weekday", "hour"]).agg({
-            "count_in": "mean",
-            "conversion_rate": "mean",
-            "sales_per_transaction": "mean"
-        }).reset_index().rename(columns={
-            "count_in": "Bezoekers",
-            "conversion_rate": "Conversie (%)",
-            "sales_per_transaction": "ATV (€)"
-        })
-
-        best_deadhours = best_deadhours.merge(kpi_lookup, on=["weekday", "hour"], how="left")
-        best_deadhours = best_deadhours[best_deadhours["Bezoekers"] >= min_visitors]
-        best_deadhours["Conversie (%)"] = best_deadhours["Conversie (%)"].apply(lambda x: x*100 if x < 1 else x)
-
-        top_5 = best_deadhours.nlargest(5, "extra_turnover")
-        week_sum = top_5["extra_turnover"].sum()
-        year_sum = week_sum * weken_over
-
-        # Oranje summary box (als in sqm-calc) + witregel erna
-        st.markdown(f"""
-        <div class="block-orange">
-          <div style="font-weight:700;font-size:1.05rem">🚀 Top 5 dead hours leveren potentieel op:</div>
-          <div class="kpi" style="margin-top:4px">{fmt_eur(week_sum)} per week ≈ {fmt_eur(year_sum)} per jaar</div>
-          <div class="note">Gebaseerd op de geselecteerde analyseperiode en filters.</div>
-        </div>""", unsafe_allow_html=True)
-        st.markdown('<div class="h-gap"></div>', unsafe_allow_html=True)  # ← witregel
-
-        # Sortering weekdagen
-        ordered_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        best_deadhours["weekday"] = pd.Categorical(best_deadhours["weekday"], categories=ordered_days, ordered=True)
-        best_deadhours = best_deadhours.sort_values(["weekday", "hour"])
-
-        # Tabel in EU‑notatie (zoals gevraagd)
-        disp = best_deadhours[[
-            "weekday", "hour", "extra_turnover",
-            "Jaarpotentie (52w)", "Jaarpotentie (realistisch)",
-            "Bezoekers", "Conversie (%)", "ATV (€)"
-        ]].rename(columns={
-            "weekday": "Weekdag",
-            "hour": "Uur",
-            "extra_turnover": "Extra omzet (per week)"
-        })
-
-        st.dataframe(
-            disp.style.format({
-                "Extra omzet (per week)": fmt_eur,
-                "Jaarpotentie (52w)": fmt_eur,
-                "Jaarpotentie (realistisch)": fmt_eur,
-                "Bezoekers": fmt_int,
-                "Conversie (%)": fmt_pct,
-                "ATV (€)": fmt_eur
-            }),
-            use_container_width=True
-        )
-
-        st.caption("💡 *SPV = Conversie × Bonbedrag (ATV)* — deze tabel laat zien hoeveel extra omzet te winnen is per uur per weekdag.")
-
-        # Bar chart: Viridis palet per 'uur' + EU-hover
-        best_deadhours_sorted = best_deadhours.copy()
-        best_deadhours_sorted["hover_val"] = best_deadhours_sorted["extra_turnover"].map(fmt_eur)
-
-        fig2 = px.bar(
-            best_deadhours_sorted.sort_values("weekday"),
-            x="extra_turnover",
-            y="weekday",
-            color="hour",
-            orientation="h",
-            labels={"extra_turnover": "Extra omzet (€)", "weekday": "Weekdag", "hour": "Uur"},
-            title="Dead Hours met hoogste omzetpotentie per weekdag",
-            color_discrete_sequence=px.colors.sequential.Viridis,  # ← verschillende kleuren per uur
-            category_orders={"weekday": ordered_days},
-            custom_data=["hover_val"]
-        )
-        fig2.update_traces(
-            text=best_deadhours_sorted["extra_turnover"].map(lambda v: ("{:,.0f}".format(v)).replace(",", ".")),
-            textposition="outside",
-            hovertemplate="%{y} • %{customdata[0]}<br>Uur: %{color}"
-        )
-        st.plotly_chart(fig2, use_container_width=True)
+    # Ophalen buiten de script-thread; de cube vult zich per binnengekomen deel
+    start_kpi_load("deadhour", shop_ids, start_date, end_date, start_hour, end_hour,
+                   metrics=StageMetrics(page="dead-hour-optimizer", shops=len(shop_ids)))
+    st.session_state["deadhour_query"] = {
+        "shop_ids": list(shop_ids), "start_date": start_date, "end_date": end_date, "hours": opening_hours,
+    }
+
+job = get_kpi_load("deadhour")
+if job is not None and job.running and not job.matches(shop_ids, start_date, end_date, *opening_hours):
+    cancel_kpi_load("deadhour")  # selectie gewijzigd: niet verder ophalen voor de oude
+
+# Resultaten komen uit de cube: sliders binnen het opgehaalde venster herberekenen zonder nieuwe fetch
+query = st.session_state.get("deadhour_query")
+if query is not None:
+    start_hour, end_hour = opening_hours
+    fetched_from, fetched_to = query["hours"]
+    if start_date < query["start_date"] or start_hour < fetched_from or end_hour > fetched_to:
+        st.info("ℹ️ De selectie valt buiten de opgehaalde data; klik opnieuw op Analyseer Dead Hours om bij te laden.")
+        start_hour, end_hour = fetched_from, fetched_to
+        view_start = query["start_date"]
+    else:
+        view_start = start_date
+
+    def simulate_shop(shop_id):
+        method = "bootstrap" if statistical else "simulate"
+        with metrics.stage(method) as record:
+            df_results = get_cube_results(method, [shop_id], view_start, query["end_date"], start_hour, end_hour, metrics=metrics)
+            record["rows"] = len(df_results)
+        if toggle == "Prognose resterend jaar" and not df_results.empty:
+            with metrics.stage("forecast", rows=len(df_results)):
+                vandaag = date.today()
+                df_results = get_slot_cube().project(df_results, vandaag + timedelta(days=1), date(vandaag.year, 12, 31), shop_id=shop_id)
+        return df_results
+
+    def show_shop(shop_id):
+        df_results = simulate_shop(shop_id)
+        if df_results.empty and job is not None and job.running:
+            st.info("⏳ Nog geen data binnen voor deze winkel; de analyse verschijnt zodra het eerste deel er is.")
+        else:
+            render_dead_hour_analysis(df_results, toggle, min_visitors, key=str(shop_id), metrics=metrics)
 
+    render_kpi_load_status(job)
+    if not query["shop_ids"]:
+        st.warning("⚠️ Selecteer minimaal één winkel.")
+    elif len(query["shop_ids"]) == 1:
+        show_shop(query["shop_ids"][0])
     else:
-        st.warning("⚠️ Geen data beschikbaar voor deze periode.")
+        for tab, shop_id in zip(st.tabs([ID_TO_NAME[sid] for sid in query["shop_ids"]]), query["shop_ids"]):
+            with tab:
+                show_shop(shop_id)
+
+    export_metrics()
+    render_metrics_debug(metrics, job.metrics if job is not None else None)
+    poll_kpi_load(job)
@@ -4,84 +4,18 @@ import streamlit as st
 import sys
 import os
 import pandas as pd
-import requests
 import plotly.express as px
 from datetime import date, timedelta
-from urllib.parse import urlencode
 import numpy as np
 
-st.cache_data.clear()
 sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
 
 from shop_mapping import SHOP_NAME_MAP
-from data_transformer import normalize_vemcount_response
+from deadhour_engine import WEEKDAYS, add_slot_columns, find_deadhours_and_simulate, label_slots
+from deadhour.ui import get_kpi_data_for_store
 
-API_URL = st.secrets["API_URL"].rstrip("/")
 DEFAULT_SHOP_IDS = list(SHOP_NAME_MAP.keys())
 
-def get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour) -> pd.DataFrame:
-    start_date = pd.to_datetime(start_date).strftime("%Y-%m-%d")
-    end_date = pd.to_datetime(end_date).strftime("%Y-%m-%d")
-
-    params = [
-        ("data", shop_id),
-        ("data_output", "count_in"),
-        ("data_output", "conversion_rate"),
-        ("data_output", "turnover"),
-        ("data_output", "sales_per_visitor"),
-        ("data_output", "sales_per_transaction"),
-        ("source", "shops"),
-        ("period", "date"),
-        ("form_date_from", start_date),
-        ("form_date_to", end_date),
-        ("step", "hour"),
-        ("show_hours_from", f"{start_hour:02d}:00"),
-        ("show_hours_to", f"{end_hour:02d}:00")
-    ]
-
-    query_string = urlencode(params, doseq=True).replace('%3A', ':')
-    url = f"{API_URL}?{query_string}"
-
-    try:
-        response = requests.post(url)
-        if response.status_code == 200:
-            raw_data = response.json()
-            if "data" in raw_data and raw_data["data"]:
-                df = normalize_vemcount_response(raw_data)
-                df["hour"] = pd.to_datetime(df["datetime"]).dt.hour
-                df = df[(df["hour"] >= start_hour) & (df["hour"] < end_hour)]
-                return df
-            else:
-                st.warning("⚠️ De API gaf een lege dataset terug.")
-        else:
-            st.error(f"❌ Error fetching data: {response.status_code}")
-    except Exception as e:
-        st.error(f"🚨 API call exception: {e}")
-
-    return pd.DataFrame()
-
-def find_deadhours_and_simulate(df: pd.DataFrame) -> pd.DataFrame:
-    df["weekday"] = pd.to_datetime(df["datetime"]).dt.day_name()
-    df["hour"] = pd.to_datetime(df["datetime"]).dt.hour
-    df["datetime"] = pd.to_datetime(df["datetime"])
-
-    df_grouped = df.groupby(["weekday", "hour"]).agg({
-        "count_in": "sum",
-        "conversion_rate": "mean",
-        "turnover": "sum",
-        "sales_per_visitor": "mean",
-        "sales_per_transaction": "mean"
-    }).reset_index()
-
-    avg_spv = df_grouped["sales_per_visitor"].mean()
-    df_grouped["original"] = df_grouped["turnover"]
-    df_grouped["uplift"] = df_grouped.apply(
-        lambda row: row["count_in"] * avg_spv if row["sales_per_visitor"] < avg_spv else row["turnover"], axis=1)
-    df_grouped["extra_turnover"] = df_grouped["uplift"] - df_grouped["turnover"]
-    df_grouped["growth_pct"] = (df_grouped["extra_turnover"] / df_grouped["turnover"]).replace([np.inf, -np.inf], 0)
-
-    return df_grouped.sort_values("extra_turnover", ascending=False)
-
 # -----------------------------
 # STREAMLIT UI
 # -----------------------------
@@ -121,22 +55,20 @@ if btn:
         df_kpi = get_kpi_data_for_store(shop_id, start_date, end_date, start_hour, end_hour)
 
     if not df_kpi.empty:
-        df_results = find_deadhours_and_simulate(df_kpi)
+        df_results = find_deadhours_and_simulate(add_slot_columns(df_kpi))
 
-        df_kpi["weekday"] = pd.to_datetime(df_kpi["datetime"]).dt.day_name()
-        df_kpi["hour"] = pd.to_datetime(df_kpi["datetime"]).dt.hour
-        omzet_lookup = df_kpi.groupby(["weekday", "hour"])["turnover"].mean().reset_index()
-        omzet_lookup.rename(columns={"turnover": "Omzet in dead hour"}, inplace=True)
+        omzet_lookup = label_slots(df_kpi.groupby(["weekday_num", "hour_num"])["turnover"].mean().reset_index())
+        omzet_lookup = omzet_lookup[["weekday", "hour", "turnover"]].rename(columns={"turnover": "Omzet in dead hour"})
 
         st.markdown("### 🔥 Dead Hours per Weekdag (gemiddelde omzetpotentie)")
 
         best_deadhours = (
             df_results[df_results["extra_turnover"] > 0]
-            .groupby(["weekday", "hour"])["extra_turnover"]
+            .groupby(["weekday", "hour"], observed=True)["extra_turnover"]
             .mean()
             .reset_index()
             .sort_values("extra_turnover", ascending=False)
-            .groupby("weekday")
+            .groupby("weekday", observed=True)
             .head(1)
             .reset_index(drop=True)
         )
@@ -155,7 +87,7 @@ if btn:
         ) * 100
         best_deadhours["% Groei op uur"] = best_deadhours["% Groei op uur"].replace([np.inf, -np.inf], 0).round(1)
 
-        ordered_days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        ordered_days = WEEKDAYS
         best_deadhours["weekday"] = pd.Categorical(best_deadhours["weekday"], categories=ordered_days, ordered=True)
         best_deadhours = best_deadhours.sort_values("weekday")
 
@@ -181,23 +113,3 @@ if btn:
 
     else:
         st.warning("⚠️ Geen data beschikbaar voor deze periode.")
-        st.markdown("### 📋 Zwakste uur per weekdag")
-        st.dataframe(best_deadhours.rename(columns={
-            "hour": "Uur",
-            "weekday": "Weekdag",
-            "count_in": "Gem. bezoekers",
-            "conversion_rate": "Conversie",
-            "sales_per_visitor": "SPV",
-            "extra_turnover": "Potentie (€)"
-        })[["Weekdag", "Uur", "Gem. bezoekers", "Conversie", "SPV", "Potentie (€)"]].style.format({
-            "Gem. bezoekers": "{:,.0f}",
-            "Conversie": "{:.1%}",
-            "SPV": "€{:.2f}",
-            "Potentie (€)": "€{:,.0f}"
-        }), use_container_width=True)
-
-
-st.plotly_chart(fig, use_container_width=True)
-
-    else:
-        st.warning("⚠️ Geen data beschikbaar voor deze periode.")
@@ -0,0 +1,142 @@
+# 🧪 Scenario Sweep – gevoeligheid van de dead-hour potentie voor doel, uplift, drempel en openingstijden
+
+import streamlit as st
+import sys
+import os
+import numpy as np
+from datetime import date, timedelta
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__) + '/../'))
+
+from shop_mapping import SHOP_NAME_MAP
+from deadhour_engine import SWEEP_MIN_VISITORS, SWEEP_PERCENTILES, SWEEP_UPLIFTS
+from deadhour.charts import cached_figure, sweep_heatmap_figure
+from deadhour.formatting import fmt_eur, fmt_int, format_eur, format_eur2, format_frame, format_int, format_pct
+from deadhour.metrics import StageMetrics
+from deadhour.ui import (
+    cancel_kpi_load, export_metrics, get_cube_results, get_kpi_load, poll_kpi_load, render_kpi_load_status,
+    render_metrics_debug, render_prefetch_status, start_kpi_load,
+)
+
+st.set_page_config(page_title="Scenario Sweep", layout="wide")
+
+UPLIFT_OPTIONS = [0.05, 0.10, 0.15, 0.20, 0.30, np.inf]
+
+
+def uplift_label(u):
+    return "tot doel" if np.isinf(u) else f"+{u * 100:.0f}%"
+
+
+# ─────────────────────────  Weergave  ─────────────────────────
+def render_sweep(sweep, metrics):
+    if sweep.empty:
+        st.warning("⚠️ Geen data beschikbaar voor deze periode.")
+        return
+
+    best = sweep.loc[sweep["extra_turnover"].idxmax()]
+    st.markdown(
+        f"**{fmt_int(len(sweep))} scenario's** doorgerekend · beste: {best['start_hour']:02d}:00–{best['end_hour']:02d}:00, "
+        f"doel {best['target']}, uplift {uplift_label(best['uplift'])}, min. {best['min_visitors']} bezoekers "
+        f"→ {fmt_eur(best['extra_turnover'])} extra omzet in de analyseperiode"
+    )
+
+    # Gevoeligheid: doel × uplift voor één venster en drempel (standaard die van het beste scenario)
+    windows = sweep[["start_hour", "end_hour"]].drop_duplicates().sort_values(["start_hour", "end_hour"])
+    window_options = list(windows.itertuples(index=False, name=None))
+    col1, col2 = st.columns(2)
+    window = col1.selectbox("Openingsvenster", window_options, index=window_options.index((best["start_hour"], best["end_hour"])),
+                            format_func=lambda w: f"{w[0]:02d}:00–{w[1]:02d}:00")
+    thresholds = sorted(sweep["min_visitors"].unique())
+    threshold = col2.selectbox("Minimum gem. bezoekers per uur", thresholds, index=thresholds.index(best["min_visitors"]))
+
+    with metrics.stage("figure"):
+        part = sweep[(sweep["start_hour"] == window[0]) & (sweep["end_hour"] == window[1]) & (sweep["min_visitors"] == threshold)]
+        fig = cached_figure("sweep_heatmap", sweep_heatmap_figure, part[["target", "uplift", "extra_turnover"]])
+    st.plotly_chart(fig, use_container_width=True, key="sweep_heatmap")
+
+    with metrics.stage("render_prep", rows=len(sweep)):
+        top = sweep.nlargest(50, "extra_turnover")
+        disp = top.assign(
+            window=[f"{s:02d}:00–{e:02d}:00" for s, e in zip(top["start_hour"], top["end_hour"])],
+            uplift=[uplift_label(u) for u in top["uplift"]],
+        )[["window", "target", "target_spv", "uplift", "min_visitors", "lifted_slots", "extra_turnover", "extra_pct"]].rename(columns={
+            "window": "Openingsvenster",
+            "target": "Doel",
+            "target_spv": "Doel-SPV",
+            "uplift": "Uplift",
+            "min_visitors": "Min. bezoekers",
+            "lifted_slots": "Slots opgetild",
+            "extra_turnover": "Extra omzet",
+            "extra_pct": "% van omzet venster",
+        })
+    st.dataframe(
+        format_frame(disp, {
+            "Doel-SPV": format_eur2,
+            "Slots opgetild": format_int,
+            "Extra omzet": format_eur,
+            "% van omzet venster": format_pct,
+        }),
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.download_button("⬇️ Download alle scenario's (CSV)", sweep.to_csv(index=False).encode("utf-8"),
+                       file_name="scenario-sweep.csv", mime="text/csv")
+    st.caption("💡 Doel = gemiddelde of percentiel van de uur-SPV's binnen het venster; uplift begrenst hoeveel "
+               "de SPV van een zwak uur mag stijgen (conversie × ATV), nooit boven het doel.")
+
+# ─────────────────────────  UI  ─────────────────────────
+st.title("🧪 Scenario Sweep")
+st.markdown("Reken in één keer duizenden varianten door: doel-SPV, conversie-uplift, bezoekersdrempel en openingstijden.")
+render_prefetch_status()
+
+NAME_TO_ID = {v: k for k, v in SHOP_NAME_MAP.items()}
+
+selected_name = st.selectbox("Selecteer een winkel", options=list(NAME_TO_ID.keys()), index=0)
+shop_ids = [NAME_TO_ID[selected_name]]
+
+days = st.slider("Analyseer over hoeveel dagen terug?", min_value=7, max_value=3 * 364, step=7, value=30)
+end_date = date.today()
+start_date = end_date - timedelta(days=days)
+
+hours = st.slider("⏰ Openingsvensters binnen", min_value=0, max_value=24, value=(8, 21), step=1, format="%02d:00")
+min_window_hours = st.slider("Minimale openingsduur (uren)", min_value=1, max_value=12, value=6)
+
+col1, col2, col3 = st.columns(3)
+percentiles = col1.multiselect("Doel-percentielen (naast het gemiddelde)", [50, 60, 70, 75, 80, 90, 95], default=list(SWEEP_PERCENTILES))
+uplifts = col2.multiselect("Conversie-uplift", UPLIFT_OPTIONS, default=list(SWEEP_UPLIFTS), format_func=uplift_label)
+min_visitors = col3.multiselect("Minimum gem. bezoekers", [0, 1, 2, 5, 10, 20], default=list(SWEEP_MIN_VISITORS))
+
+metrics = StageMetrics(page="scenario-sweep", shops=len(shop_ids))
+
+if st.button("🧪 Start sweep", type="secondary"):
+    start_kpi_load("sweep", shop_ids, start_date, end_date, *hours,
+                   metrics=StageMetrics(page="scenario-sweep", shops=len(shop_ids)))
+    st.session_state["sweep_query"] = {"shop_ids": shop_ids, "start_date": start_date, "end_date": end_date, "hours": hours}
+
+job = get_kpi_load("sweep")
+if job is not None and job.running and not job.matches(shop_ids, start_date, end_date, *hours):
+    cancel_kpi_load("sweep")  # selectie gewijzigd: niet verder ophalen voor de oude
+
+query = st.session_state.get("sweep_query")
+if query is not None:
+    render_kpi_load_status(job)
+    if not (uplifts and min_visitors):
+        st.warning("⚠️ Kies minimaal één uplift en één bezoekersdrempel.")
+    else:
+        if not percentiles:
+            st.caption("ℹ️ Geen percentielen gekozen: alleen het gemiddelde wordt als doel-SPV doorgerekend.")
+        with metrics.stage("sweep") as record:
+            sweep = get_cube_results(
+                "sweep", query["shop_ids"], query["start_date"], query["end_date"], *query["hours"], metrics=metrics,
+                min_window_hours=min_window_hours, percentiles=tuple(sorted(percentiles)),
+                uplifts=tuple(sorted(uplifts)), min_visitors=tuple(sorted(min_visitors)),
+            )
+            record["rows"] = len(sweep)
+        if sweep.empty and job is not None and job.running:
+            st.info("⏳ Nog geen data binnen; de sweep verschijnt zodra het eerste deel er is.")
+        else:
+            render_sweep(sweep, metrics)
+
+    export_metrics()
+    render_metrics_debug(metrics, job.metrics if job is not None else None)
+    poll_kpi_load(job)
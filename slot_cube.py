@@ -0,0 +1,238 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from deadhour_engine import SLOT_AGGREGATIONS, add_slot_columns, apply_uplift, finalize_results, opening_windows, sweep_scenarios
+from fetch_planner import to_date
+from slot_forecast import SlotForecaster
+
+DEFAULT_CUBE_MAX_BYTES = 256 * 1024 * 1024
+
+CUBE_KEYS = ["shop_id", "date", "hour_num"]
+
+
+def cube_from_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Comprimeer genormaliseerde uurdata tot cube-rijen: per (shop, datum, uur) sommen en
+    aantallen per KPI, plus ISO-jaar/-week en weekdag als sleutelkolommen."""
+    if df.empty:
+        return pd.DataFrame()
+    if "weekday_num" not in df.columns or "hour_num" not in df.columns:
+        df = add_slot_columns(df.copy())
+
+    kpis = [kpi for kpi in SLOT_AGGREGATIONS if kpi in df.columns]
+    keyed = df.assign(date=df["datetime"].dt.normalize())
+    cube = keyed.groupby(CUBE_KEYS, observed=True, sort=True).agg(
+        **{f"{kpi}_sum": (kpi, "sum") for kpi in kpis},
+        **{f"{kpi}_n": (kpi, "count") for kpi in kpis},
+    ).reset_index()
+    # Compact: sommen in de KPI-dtype van het uurframe (float32), aantallen per uur passen in int16
+    cube = cube.astype({f"{kpi}_n": "int16" for kpi in kpis})
+
+    iso = cube["date"].dt.isocalendar()
+    cube["iso_year"] = iso["year"].astype("int16")
+    cube["iso_week"] = iso["week"].astype("int8")
+    cube["weekday_num"] = cube["date"].dt.dayofweek.astype("int8")
+    return cube
+
+
+def simulate_from_cube(cube: pd.DataFrame, group_keys=(), benchmark="store") -> pd.DataFrame:
+    """Zelfde uitkomst als find_deadhours_and_simulate, maar vanuit cube-rijen: alleen sommen
+    en aantallen optellen en delen, geen uurdata meer nodig."""
+    group_keys = list(group_keys)
+    value_columns = [c for c in cube.columns if c.endswith("_sum") or c.endswith("_n")]
+    totals = cube.groupby(group_keys + ["weekday_num", "hour_num"], observed=True, sort=True)[value_columns].sum().reset_index()
+
+    grouped = totals[group_keys + ["weekday_num", "hour_num"]].copy()
+    for kpi, how in SLOT_AGGREGATIONS.items():
+        if f"{kpi}_sum" not in totals.columns:
+            continue
+        total = totals[f"{kpi}_sum"].to_numpy(dtype="float64")
+        if how == "sum":
+            grouped[kpi] = total
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                grouped[kpi] = total / totals[f"{kpi}_n"].to_numpy(dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        grouped["visitors_mean"] = totals["count_in_sum"].to_numpy(dtype="float64") / totals["count_in_n"].to_numpy(dtype="float64")
+
+    return finalize_results(apply_uplift(grouped, group_keys, benchmark), group_keys)
+
+
+def _row_quantiles(values, quantiles):
+    """Zelfde als np.quantile(values, quantiles, axis=1) (lineair), maar via np.partition op
+    alleen de benodigde orde-statistieken in plaats van een volledige sortering per rij."""
+    positions = (values.shape[1] - 1) * np.asarray(quantiles)
+    low = np.floor(positions).astype(int)
+    high = np.minimum(low + 1, values.shape[1] - 1)
+    part = np.partition(values, np.unique(np.concatenate([low, high])), axis=1)
+    return [part[:, lo] + (pos - lo) * (part[:, hi] - part[:, lo]) for pos, lo, hi in zip(positions, low, high)]
+
+
+BOOTSTRAP_COLUMNS = ["count_in_sum", "turnover_sum", "sales_per_visitor_sum", "sales_per_visitor_n"]
+
+
+def bootstrap_from_cube(cube: pd.DataFrame, group_keys=(), n_boot=2000, ci=0.90, seed=0, benchmark="store",
+                        chunk_slots=2048) -> pd.DataFrame:
+    """simulate_from_cube plus bootstrap-betrouwbaarheidsinterval op extra_turnover per slot.
+
+    Observaties zijn de ISO-weken van elk slot (weekdag × uur). Per aantal weken wordt één
+    (weken × n_boot) matrix met multinomiale resample-gewichten getrokken; de geresamplede
+    sommen zijn dan matrixproducten, dus geen Python-lus per slot of per resample. Slots delen
+    die gewichten (marginaal correct, onderling gecorreleerd). De benchmark-SPV blijft vast.
+
+    Voegt extra_lower, extra_upper en n_weeks toe; rangschik op extra_lower om ruisige uren
+    met weinig bezoekers niet bovenaan te krijgen.
+    """
+    group_keys = list(group_keys)
+    point = simulate_from_cube(cube, group_keys, benchmark)
+    slot_keys = group_keys + ["weekday_num", "hour_num"]
+
+    weekly = cube.groupby(slot_keys + ["iso_year", "iso_week"], observed=True, sort=True)[BOOTSTRAP_COLUMNS].sum().reset_index()
+    codes = weekly.groupby(slot_keys, observed=True, sort=True).ngroup().to_numpy()
+    slots = weekly[slot_keys].drop_duplicates().reset_index(drop=True)
+    n_weeks = np.bincount(codes)
+    position = weekly.groupby(codes, sort=False).cumcount().to_numpy()
+
+    def dense(column):
+        matrix = np.zeros((len(slots), n_weeks.max()))
+        matrix[codes, position] = weekly[column].to_numpy(dtype="float64")
+        return matrix
+
+    visitors, turnover, spv_sum, spv_n = (dense(c) for c in BOOTSTRAP_COLUMNS)
+    avg_spv = slots.merge(point[slot_keys + ["avg_spv"]], on=slot_keys, how="left")["avg_spv"].to_numpy()[:, None]
+
+    # Beide grootheden zijn lineair in de resample-gewichten W:
+    #   extra     = Σ bezoekers·avg − Σ omzet          = (bezoekers·avg − omzet) @ W
+    #   spv < avg ⇔ Σ spv_som − avg·Σ spv_n < 0       = (spv_som − avg·spv_n) @ W < 0
+    # dus twee matrixproducten per chunk, zonder deling.
+    uplift = (visitors * avg_spv - turnover).astype("float32")
+    below = (spv_sum - avg_spv * spv_n).astype("float32")
+
+    rng = np.random.default_rng(seed)
+    quantiles = [(1 - ci) / 2, 1 - (1 - ci) / 2]
+    lower, upper = np.zeros(len(slots)), np.zeros(len(slots))
+    for n in np.unique(n_weeks):
+        weights = rng.multinomial(n, np.full(n, 1 / n), size=n_boot).T.astype("float32")  # (n, n_boot)
+        rows = np.flatnonzero(n_weeks == n)
+        for chunk in np.array_split(rows, -(-len(rows) // chunk_slots)):
+            extra = uplift[chunk, :n] @ weights
+            extra[below[chunk, :n] @ weights >= 0] = 0.0
+            # Slots die in geen enkele resample onder de benchmark zakken hebben interval [0, 0]
+            active = (extra != 0).any(axis=1)
+            if active.any():
+                lower[chunk[active]], upper[chunk[active]] = _row_quantiles(extra[active], quantiles)
+
+    slots["extra_lower"], slots["extra_upper"], slots["n_weeks"] = lower, upper, n_weeks
+    return point.merge(slots, on=slot_keys, how="left")
+
+
+class SlotCube:
+    """Per winkel voorberekende weekdag × uur × ISO-week cube, incrementeel bij te werken.
+
+    Sliders voor openingstijden, minimum bezoekers en jaarbasis kunnen hieruit in
+    milliseconden opnieuw doorgerekend worden zonder opnieuw te fetchen of te normaliseren.
+    Boven `max_bytes` wordt de langst niet gebruikte winkel vergeten, inclusief diens prognosemodel;
+    de volgende load vult die weer aan vanuit de store.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CUBE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._cubes = OrderedDict()  # shop_id -> cube DataFrame, minst recent gebruikt eerst
+        self._fingerprints = {}  # shop_id -> hash van de cube-inhoud
+        self._nbytes = {}  # shop_id -> geheugengebruik van de cube
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.forecaster = SlotForecaster()
+
+    def update(self, df: pd.DataFrame):
+        """Voeg nieuwe uurdata toe; bestaande (datum, uur)-cellen worden vervangen."""
+        new = cube_from_frame(df)
+        if new.empty:
+            return
+        with self._lock:
+            for shop_id, part in new.groupby("shop_id", sort=False):
+                existing = self._cubes.get(int(shop_id))
+                if existing is not None:
+                    part = pd.concat([existing, part], ignore_index=True)
+                    part = part.drop_duplicates(subset=CUBE_KEYS, keep="last").sort_values(["date", "hour_num"])
+                self._store(int(shop_id), part.reset_index(drop=True))
+            self._evict(keep=set(new["shop_id"].astype(int)))
+
+    def fingerprint(self, shop_ids) -> tuple:
+        """Inhoudshash per winkel (0 = geen data): gelijk zolang de cube niet verandert, ook in
+        een ander proces met dezelfde data. Bedoeld als deel van een cache-sleutel voor resultaten."""
+        with self._lock:
+            return tuple(self._fingerprints.get(int(s), 0) for s in shop_ids)
+
+    def slice(self, shop_ids, start_date, end_date, start_hour, end_hour) -> pd.DataFrame:
+        start, end = pd.Timestamp(to_date(start_date)), pd.Timestamp(to_date(end_date))
+        with self._lock:
+            parts = []
+            for s in shop_ids:
+                if int(s) in self._cubes:
+                    self._cubes.move_to_end(int(s))
+                    parts.append(self._cubes[int(s)])
+        if not parts:
+            return pd.DataFrame()
+        cube = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        mask = (cube["date"] >= start) & (cube["date"] <= end) & (cube["hour_num"] >= start_hour) & (cube["hour_num"] < end_hour)
+        return cube[mask]
+
+    def simulate(self, shop_ids, start_date, end_date, start_hour, end_hour, group_keys=(), benchmark="store") -> pd.DataFrame:
+        cube = self.slice(shop_ids, start_date, end_date, start_hour, end_hour)
+        if cube.empty:
+            return pd.DataFrame()
+        return simulate_from_cube(cube, group_keys, benchmark)
+
+    def bootstrap(self, shop_ids, start_date, end_date, start_hour, end_hour, group_keys=(), **kwargs) -> pd.DataFrame:
+        cube = self.slice(shop_ids, start_date, end_date, start_hour, end_hour)
+        if cube.empty:
+            return pd.DataFrame()
+        return bootstrap_from_cube(cube, group_keys, **kwargs)
+
+    def sweep(self, shop_ids, start_date, end_date, start_hour, end_hour, min_window_hours=1, **kwargs) -> pd.DataFrame:
+        """Scenario-raster (zie sweep_scenarios) over alle openingsvensters binnen [start_hour, end_hour)."""
+        windows = opening_windows(start_hour, end_hour, min_window_hours)
+        slots = self.simulate(shop_ids, start_date, end_date, start_hour, end_hour, group_keys=["shop_id"])
+        if slots.empty or not windows:
+            return pd.DataFrame()
+        return sweep_scenarios(slots, windows, **kwargs)
+
+    def project(self, results: pd.DataFrame, start_date, end_date, shop_id=None) -> pd.DataFrame:
+        """Prognose van de extra omzet over [start_date, end_date] voor simulate/bootstrap-resultaten.
+
+        Het seizoensmodel van een winkel wordt alleen bijgewerkt als diens cube sinds de vorige
+        prognose veranderd is, en dan alleen voor de gewijzigde cellen (zie SlotForecaster.fit)."""
+        shop_ids = results["shop_id"].unique() if "shop_id" in results.columns else [shop_id]
+        for sid in shop_ids:
+            with self._lock:
+                cube, fingerprint = self._cubes.get(int(sid)), self._fingerprints.get(int(sid))
+            if cube is not None:
+                self.forecaster.fit(sid, cube, fingerprint=fingerprint)
+        return self.forecaster.project(results, start_date, end_date, shop_id)
+
+    def nbytes(self):
+        with self._lock:
+            return self._bytes
+
+    def _store(self, shop_id, cube):
+        self._bytes -= self._nbytes.pop(shop_id, 0)
+        self._cubes[shop_id] = cube
+        self._cubes.move_to_end(shop_id)
+        self._fingerprints[shop_id] = int(pd.util.hash_pandas_object(cube, index=False).sum())
+        self._nbytes[shop_id] = int(cube.memory_usage(deep=True).sum())
+        self._bytes += self._nbytes[shop_id]
+
+    def _evict(self, keep=()):
+        # Winkels uit de lopende update blijven staan, ook als die samen boven het budget zitten
+        for shop_id in list(self._cubes):
+            if self._bytes <= self.max_bytes:
+                break
+            if shop_id in keep:
+                continue
+            self._cubes.pop(shop_id)
+            self._fingerprints.pop(shop_id, None)
+            self._bytes -= self._nbytes.pop(shop_id)
+            self.forecaster.forget(shop_id)
@@ -0,0 +1,205 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64("2000-01-03", "D")  # maandag; vaste oorsprong, zodat sommen optelbaar blijven
+N_SLOTS = 7 * 24
+SEASONAL_MIN_YEARS = 1.0  # jaarseizoen pas schatten met minstens een jaar historie in het slot
+TARGETS = ["count_in_sum", "turnover_sum"]
+OBS_KEYS = ["date", "weekday_num", "hour_num"]
+
+
+def design_matrix(dates, harmonics=1) -> np.ndarray:
+    """Regressoren per datum: niveau, trend (jaren sinds EPOCH) en `harmonics` jaarlijkse sin/cos-paren."""
+    days = (np.asarray(dates, dtype="datetime64[D]") - EPOCH).astype("float64")
+    years = days / 365.25
+    columns = [np.ones_like(years), years]
+    for k in range(1, harmonics + 1):
+        angle = 2 * np.pi * k * years
+        columns += [np.sin(angle), np.cos(angle)]
+    return np.stack(columns, axis=-1)
+
+
+def _slot_sums(slot, values) -> np.ndarray:
+    """(n, m) waarden → (N_SLOTS, m) sommen per slot, via één bincount per kolom."""
+    return np.stack([np.bincount(slot, weights=values[:, j], minlength=N_SLOTS) for j in range(values.shape[1])], axis=1)
+
+
+def _observations(cube: pd.DataFrame) -> pd.DataFrame:
+    """Cube-rijen van één winkel → één observatie per (datum, uur): bezoekers en omzet van dat uur."""
+    valid = (cube["count_in_n"] > 0) & (cube["turnover_n"] > 0)
+    obs = cube.loc[valid, OBS_KEYS + TARGETS]
+    return obs.astype({target: "float64" for target in TARGETS}).reset_index(drop=True)
+
+
+def _history_years(obs: pd.DataFrame) -> np.ndarray:
+    """(N_SLOTS,) tijd tussen eerste en laatste observatie per slot, in jaren (0 zonder observaties)."""
+    span = np.zeros(N_SLOTS)
+    if obs.empty:
+        return span
+    slot = obs["weekday_num"].to_numpy(dtype="int64") * 24 + obs["hour_num"].to_numpy(dtype="int64")
+    days = (obs["date"].to_numpy().astype("datetime64[D]") - EPOCH).astype("float64")
+    first, last = np.full(N_SLOTS, np.inf), np.full(N_SLOTS, -np.inf)
+    np.minimum.at(first, slot, days)
+    np.maximum.at(last, slot, days)
+    observed = np.isfinite(first)
+    span[observed] = (last[observed] - first[observed]) / 365.25
+    return span
+
+
+class SlotForecaster:
+    """Lichtgewicht seizoensmodel per winkel × weekdag × uur, voor alle slots tegelijk geschat.
+
+    Elk slot krijgt een ridge-regressie van bezoekers en omzet op niveau + trend + jaarseizoen.
+    Per winkel worden XᵀX en Xᵀy per slot bijgehouden: een update telt alleen gewijzigde
+    (datum, uur)-cellen erbij of eraf en lost daarna in één batch de geraakte slots opnieuw op.
+
+    Tegen wilde extrapolatie uit korte vensters:
+    - de trend wordt gecentreerd op het midden van de observaties van het slot, zodat de
+      ridge-straf de helling naar 0 trekt rond dat midden en het niveau gelijk blijft aan het gemiddelde;
+    - de straf schaalt met het aantal observaties (`ridge` · n), dus een trend moet over het
+      venster echt zichtbaar zijn en verdwijnt niet vanzelf naarmate er meer weken bijkomen;
+    - het jaarseizoen (sin/cos) wordt alleen geschat voor slots met minstens SEASONAL_MIN_YEARS
+      historie; daaronder is het model niveau + trend.
+    """
+
+    def __init__(self, harmonics=1, ridge=0.3):
+        self.harmonics = harmonics
+        self.ridge = ridge
+        self.n_params = 2 + 2 * harmonics
+        self._state = {}  # shop_id -> {"obs", "xtx", "xty", "n", "coef", "fingerprint"}
+        self._lock = threading.Lock()
+
+    def _empty_state(self):
+        k = self.n_params
+        return {
+            "obs": None,
+            "xtx": np.zeros((N_SLOTS, k, k)),
+            "xty": np.zeros((N_SLOTS, k, len(TARGETS))),
+            "n": np.zeros(N_SLOTS, dtype="int64"),
+            "coef": np.full((N_SLOTS, k, len(TARGETS)), np.nan),
+            "fingerprint": None,
+        }
+
+    def _accumulate(self, state, obs, sign):
+        if obs.empty:
+            return np.array([], dtype="int64")
+        slot = obs["weekday_num"].to_numpy(dtype="int64") * 24 + obs["hour_num"].to_numpy(dtype="int64")
+        x = design_matrix(obs["date"].to_numpy(), self.harmonics)
+        y = obs[TARGETS].to_numpy()
+        k = self.n_params
+        state["xtx"] += sign * _slot_sums(slot, (x[:, :, None] * x[:, None, :]).reshape(len(x), -1)).reshape(N_SLOTS, k, k)
+        state["xty"] += sign * _slot_sums(slot, (x[:, :, None] * y[:, None, :]).reshape(len(x), -1)).reshape(N_SLOTS, k, -1)
+        state["n"] += sign * np.bincount(slot, minlength=N_SLOTS)
+        return slot
+
+    def fit(self, shop_id, cube: pd.DataFrame, fingerprint=None) -> int:
+        """Werk het model van één winkel bij met diens cube-rijen; geeft het aantal herschatte slots terug.
+
+        Met dezelfde `fingerprint` als bij de vorige fit (zie SlotCube.fingerprint) gebeurt er niets."""
+        shop_id = int(shop_id)
+        with self._lock:
+            state = self._state.get(shop_id) or self._empty_state()
+            if fingerprint is not None and state["fingerprint"] == fingerprint:
+                return 0
+
+            new = _observations(cube)
+            if state["obs"] is None:
+                old_values, new_values = new.iloc[:0], new
+            else:
+                both = state["obs"].merge(new, on=OBS_KEYS, how="outer", suffixes=("_old", ""), indicator=True)
+                same = (both["_merge"] == "both").to_numpy(copy=True)
+                for target in TARGETS:
+                    same &= (both[f"{target}_old"] == both[target]).to_numpy()
+                changed = both[~same]
+                old_values = changed.loc[changed["_merge"] != "right_only", OBS_KEYS + [f"{t}_old" for t in TARGETS]]
+                old_values = old_values.set_axis(OBS_KEYS + TARGETS, axis=1)
+                new_values = changed.loc[changed["_merge"] != "left_only", OBS_KEYS + TARGETS]
+
+            # Oude waarde van gewijzigde/verdwenen cellen eraf, nieuwe waarde erbij
+            touched = np.unique(np.concatenate([
+                self._accumulate(state, old_values, -1),
+                self._accumulate(state, new_values, +1),
+            ]))
+
+            if len(touched):
+                fitted = touched[state["n"][touched] > 0]
+                state["coef"][touched] = np.nan
+                if len(fitted):
+                    state["coef"][fitted] = self._solve(state, fitted, _history_years(new)[fitted])
+
+            state["obs"] = new
+            state["fingerprint"] = fingerprint
+            self._state[shop_id] = state
+            return len(touched)
+
+    def _solve(self, state, slots, history_years):
+        """Ridge-oplossing voor `slots` in de gecentreerde basis, terug naar coëfficiënten op X."""
+        xtx, xty, n = state["xtx"][slots], state["xty"][slots], state["n"][slots].astype("float64")
+        # x_c = A·x met jaren − gemiddelde jaren van het slot; XᵀX en Xᵀy transformeren mee
+        transform = np.broadcast_to(np.eye(self.n_params), xtx.shape).copy()
+        transform[:, 1, 0] = -xtx[:, 0, 1] / n
+        xtx_c = transform @ xtx @ transform.transpose(0, 2, 1)
+        xty_c = transform @ xty
+        xtx_c += self.ridge * n[:, None, None] * np.diag([0.0] + [1.0] * (self.n_params - 1))
+
+        coef_c = np.zeros_like(xty_c)
+        seasonal = history_years >= SEASONAL_MIN_YEARS
+        for mask, k in ((seasonal, self.n_params), (~seasonal, 2)):
+            if mask.any():
+                coef_c[mask, :k] = np.linalg.solve(xtx_c[mask, :k, :k], xty_c[mask, :k])
+        # Voorspelling x·coef = (A·x)·coef_c, dus coef = Aᵀ·coef_c
+        return transform.transpose(0, 2, 1) @ coef_c
+
+    def _predict(self, shop_id, dates):
+        """(D, 24, 2) voorspelde bezoekers en omzet per datum en uur (≥ 0; NaN zonder data)."""
+        with self._lock:
+            coef = self._state[int(shop_id)]["coef"].reshape(7, 24, self.n_params, len(TARGETS))
+        x = design_matrix(dates.to_numpy(), self.harmonics)
+        return np.clip(np.einsum("dk,dhkt->dht", x, coef[dates.dayofweek]), 0, None)
+
+    def _project_shop(self, shop_id, results, dates):
+        weekday = results["weekday_num"].to_numpy(dtype="int64")
+        hour = results["hour_num"].to_numpy(dtype="int64")
+        occurs = dates.dayofweek.to_numpy()[:, None] == weekday[None, :]  # (D, rijen)
+        if int(shop_id) not in self._state or not len(dates):
+            return np.zeros(len(results)), occurs.sum(axis=0), np.zeros(len(results), dtype="int64")
+
+        pred = self._predict(shop_id, dates)
+        visitors, turnover = pred[:, hour, 0], pred[:, hour, 1]
+        avg_spv = results["avg_spv"].to_numpy(dtype="float64")
+        # Zelfde regel als apply_uplift: alleen slots onder de benchmark-SPV worden opgetild
+        below = results["sales_per_visitor"].to_numpy(dtype="float64") < avg_spv
+        extra = np.where(occurs & below[None, :], visitors * avg_spv[None, :] - turnover, 0.0)
+        with self._lock:
+            basis = self._state[int(shop_id)]["n"][weekday * 24 + hour]
+        return np.nan_to_num(extra).sum(axis=0), occurs.sum(axis=0), basis
+
+    def project(self, results: pd.DataFrame, start_date, end_date, shop_id=None) -> pd.DataFrame:
+        """Voeg de verwachte extra omzet over [start_date, end_date] toe aan simulatieresultaten.
+
+        Nieuwe kolommen: forecast_extra (som over de toekomstige dagen van dat slot),
+        forecast_weeks (aantal keer dat het slot nog voorkomt) en forecast_basis (aantal
+        observaties waarop het model van het slot geschat is). Zonder shop_id-kolom geldt `shop_id`.
+        """
+        results = results.copy()
+        dates = pd.date_range(pd.Timestamp(start_date), pd.Timestamp(end_date), freq="D")
+        if "shop_id" in results.columns:
+            parts = results.groupby("shop_id", sort=False).indices.items()
+        else:
+            parts = [(shop_id, np.arange(len(results)))]
+
+        extra, weeks, basis = np.zeros(len(results)), np.zeros(len(results), dtype="int64"), np.zeros(len(results), dtype="int64")
+        for sid, rows in parts:
+            extra[rows], weeks[rows], basis[rows] = self._project_shop(sid, results.iloc[rows], dates)
+        results["forecast_extra"], results["forecast_weeks"], results["forecast_basis"] = extra, weeks, basis
+        return results
+
+    def forget(self, shop_id):
+        with self._lock:
+            self._state.pop(int(shop_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._state.clear()
@@ -0,0 +1,164 @@
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from urllib.parse import urlencode
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from data_transformer import normalize_vemcount_response, normalize_vemcount_stream
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class VemcountAPIError(Exception):
+    def __init__(self, status_code, message="", retried=False):
+        super().__init__(f"{status_code} {message}".strip())
+        self.status_code = status_code
+        self.retried = retried  # de client heeft deze status zelf al opnieuw geprobeerd
+
+
+def build_query_params(shop_ids, start_date, end_date, start_hour, end_hour, kpis):
+    if isinstance(shop_ids, (int, str)):
+        shop_ids = [shop_ids]
+    return [("data", shop_id) for shop_id in shop_ids] + [("data_output", kpi) for kpi in kpis] + [
+        ("source", "shops"),
+        ("period", "date"),
+        ("form_date_from", pd.to_datetime(start_date).strftime("%Y-%m-%d")),
+        ("form_date_to", pd.to_datetime(end_date).strftime("%Y-%m-%d")),
+        ("step", "hour"),
+        ("show_hours_from", f"{start_hour:02d}:00"),
+        ("show_hours_to", f"{end_hour:02d}:00")
+    ]
+
+
+def _stage(metrics, name, **fields):
+    # Zonder metrics-object een no-op die hetzelfde record-dict teruggeeft
+    return metrics.stage(name, **fields) if metrics is not None else nullcontext(fields)
+
+
+class VemcountClient:
+    """Vemcount API-client met één keep-alive connection pool, timeouts en retry met backoff.
+
+    Met `streaming=True` wordt de response-body incrementeel geparsed (zie
+    normalize_vemcount_stream) in plaats van in zijn geheel via response.json().
+    """
+
+    def __init__(self, api_url, pool_size=10, timeout=(5, 60), max_retries=4, backoff_factor=0.5, streaming=False):
+        self.api_url = api_url.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.streaming = streaming
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def build_url(self, shop_ids, start_date, end_date, start_hour, end_hour, kpis):
+        params = build_query_params(shop_ids, start_date, end_date, start_hour, end_hour, kpis)
+        # 🔐 Belangrijk: encode querystring zónder %3A in tijdvelden
+        query_string = urlencode(params, doseq=True).replace('%3A', ':')
+        return f"{self.api_url}?{query_string}"
+
+    def _post(self, shop_ids, start_date, end_date, start_hour, end_hour, kpis, stream=False):
+        url = self.build_url(shop_ids, start_date, end_date, start_hour, end_hour, kpis)
+        try:
+            response = self.session.post(url, timeout=self.timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Verbindings- en leesfouten zijn al door urllib3 opnieuw geprobeerd (zie Retry hierboven)
+            e.retried = self.max_retries > 0
+            raise
+        if response.status_code != 200:
+            response.close()
+            retried = self.max_retries > 0 and response.status_code in RETRY_STATUSES
+            raise VemcountAPIError(response.status_code, retried=retried)
+        return response
+
+    def fetch_raw(self, shop_ids, start_date, end_date, start_hour, end_hour, kpis) -> dict:
+        return self._post(shop_ids, start_date, end_date, start_hour, end_hour, kpis).json()
+
+    def fetch_frame(self, shop_ids, start_date, end_date, start_hour, end_hour, kpis, metrics=None) -> pd.DataFrame:
+        """Genormaliseerde uurdata binnen [start_hour, end_hour); leeg frame als de API niets teruggeeft.
+
+        Met een StageMetrics-object (zie deadhour.metrics) worden fetch, parse en normalize
+        apart getimed; in streaming-modus lopen die door elkaar en is het één stage.
+        """
+        if self.streaming:
+            with _stage(metrics, "fetch_stream_normalize") as record:
+                with self._post(shop_ids, start_date, end_date, start_hour, end_hour, kpis, stream=True) as response:
+                    response.raw.decode_content = True
+                    df = normalize_vemcount_stream(response.raw)
+                    record["bytes"] = response.raw.tell()
+                record["rows"] = len(df)
+        else:
+            with _stage(metrics, "fetch") as record:
+                body = self._post(shop_ids, start_date, end_date, start_hour, end_hour, kpis).content
+                record["bytes"] = len(body)
+            with _stage(metrics, "parse"):
+                raw_data = json.loads(body)
+            with _stage(metrics, "normalize") as record:
+                df = normalize_vemcount_response(raw_data) if raw_data.get("data") else pd.DataFrame()
+                record["rows"] = len(df)
+
+        if df.empty:
+            return df
+        return df[(df["hour"] >= start_hour) & (df["hour"] < end_hour)]
+
+    def fetch_kpis(self, shop_id, start_date, end_date, start_hour, end_hour, kpis, metrics=None) -> pd.DataFrame:
+        return self.fetch_frame(shop_id, start_date, end_date, start_hour, end_hour, kpis, metrics=metrics)
+
+    def fetch_kpis_batch(self, shop_ids, start_date, end_date, start_hour, end_hour, kpis, metrics=None) -> dict:
+        """Eén request voor meerdere winkels (herhaalde `data`-params); geeft {shop_id: DataFrame} terug."""
+        shop_ids = [int(shop_id) for shop_id in shop_ids]
+        frames = {shop_id: pd.DataFrame() for shop_id in shop_ids}
+        df = self.fetch_frame(shop_ids, start_date, end_date, start_hour, end_hour, kpis, metrics=metrics)
+        if df.empty:
+            return frames
+        if len(shop_ids) == 1:
+            frames[shop_ids[0]] = df
+            return frames
+
+        for shop_id, group in df.groupby("shop_id", sort=False):
+            if int(shop_id) in frames:
+                frames[int(shop_id)] = group.reset_index(drop=True)
+        return frames
+
+    def close(self):
+        self.session.close()
+
+
+def chunked(items, size):
+    items = list(items)
+    for i in range(0, len(items), max(1, size)):
+        yield items[i:i + size]
+
+
+def fetch_many(fn, items, max_workers=8, on_result=None):
+    """Roep `fn(item)` gelijktijdig aan; geeft {item: resultaat of Exception} terug.
+
+    `on_result(item, resultaat)` wordt in de aanroepende thread aangeroepen zodra een item
+    klaar is (in volgorde van afronden), bijv. om een voortgangsbalk bij te werken."""
+    results = {}
+    if not items:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        futures = {pool.submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                results[item] = future.result()
+            except Exception as e:
+                results[item] = e
+            if on_result is not None:
+                on_result(item, results[item])
+    return results